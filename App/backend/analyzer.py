@@ -1,31 +1,280 @@
 """
-analyzer.py — Training results analysis (placeholder)
-
-This module should handle:
-- Parsing training output logs
-- Extracting metrics (loss, accuracy, etc.)
-- Computing statistics across runs
-- Comparing hyperparameter configurations
-- Generating insights and recommendations
-
-Backend Implementation Steps:
-1. Create log parser to extract structured metrics from stdout
-2. Implement metric aggregation and statistics
-3. Add comparison logic for different configurations
-4. Generate JSON summaries for frontend consumption
-5. Identify best performing configurations
+analyzer.py — Training results analysis
+
+Deterministic, streaming parser for the log formats our training scripts
+print. Lines are fed one at a time (so stdout can be parsed while a job is
+still running) and turned into typed records:
+
+- mnist67/train.py:
+    "Final Validation Loss: 0.1234"
+    "[seed 3] Final Validation Loss: 0.1234"
+    "Early stopping at epoch 4/10"
+- sample_scripts/train_example.py:
+    "Starting training with lr=0.001, epochs=5, batch_size=32"
+    "Epoch 1/5" followed by indented "train_loss: ...", "val_loss: ...",
+    "lr: ...", "batches_processed: ..." lines
+    "Final validation loss: ..." / "Best validation loss: ..."
+- Sweep console logs (test.py, console_logs_to_png.HARDCODED_LOGS):
+    "[1/6] Command: python mnist67/train.py --dataset_size 100 ..."
+    "[1/6] Dataset size: 100"
+    "  Trial 1/10... Final Validation Loss: 0.5072"
+
+Only when nothing in a log is recognized is the optional LLM fallback called.
 
 Example Interface:
     analyzer = Analyzer()
-    metrics = analyzer.parse_logs(log_output)
-    best_config = analyzer.find_best_run(runs_list)
-    comparison = analyzer.compare_runs([run1, run2, run3])
-
-This file is intentionally left incomplete for backend teammates to implement.
+    records = analyzer.parse_logs(log_output)
+    for record in analyzer.stream(process.stdout):
+        ...
+    best = analyzer.find_best_run(records)
 """
 
-# TODO: Implement Analyzer class
-# TODO: Add log parsing logic
-# TODO: Implement metric extraction
+import json
+import re
+import shlex
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Iterator, Optional, Union
+
+
+@dataclass
+class EpochMetrics:
+    """Metrics from one "Epoch i/N" block."""
+    epoch: int
+    total_epochs: int
+    train_loss: Optional[float] = None
+    val_loss: Optional[float] = None
+    lr: Optional[float] = None
+    batches_processed: Optional[int] = None
+    hyperparameters: dict = field(default_factory=dict)
+
+
+@dataclass
+class FinalMetrics:
+    """Final validation loss of one training run (or one seed of an ensemble)."""
+    val_loss: float
+    seed: Optional[int] = None
+    trial: Optional[int] = None
+    stopped_epoch: Optional[int] = None
+    hyperparameters: dict = field(default_factory=dict)
+
+
+@dataclass
+class ScalarMetric:
+    """Any other named summary value, e.g. best_val_loss."""
+    name: str
+    value: float
+    hyperparameters: dict = field(default_factory=dict)
+
+
+Record = Union[EpochMetrics, FinalMetrics, ScalarMetric]
+
+_NUMBER = r"([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?|nan|inf)"
+
+_COMMAND_RE = re.compile(r"^\[(\d+)/(\d+)\] (?:Command|Executing): (.+)$")
+_DATASET_SIZE_RE = re.compile(r"^\[(\d+)/(\d+)\] Dataset size: (\d+)")
+_TRIAL_RE = re.compile(r"^Trial (\d+)/(\d+)")
+_SEED_PREFIX_RE = re.compile(r"^\[seed (-?\d+)\] ")
+_FINAL_RE = re.compile(r"Final [Vv]alidation [Ll]oss: " + _NUMBER)
+_BEST_RE = re.compile(r"^Best validation loss: " + _NUMBER)
+_EARLY_STOP_RE = re.compile(r"^Early stopping at epoch (\d+)/(\d+)")
+_EPOCH_RE = re.compile(r"^Epoch (\d+)/(\d+)$")
+_EPOCH_FIELD_RE = re.compile(r"^(train_loss|val_loss|lr|batches_processed): " + _NUMBER + r"$")
+_STARTING_RE = re.compile(r"^Starting training with (.+)$")
+_KEY_VALUE_RE = re.compile(r"(\w+)=([^,\s]+)")
+_USING_SEED_RE = re.compile(r"^Using seed: (-?\d+)")
+
+
+def _coerce(value: str):
+    """Turn a flag value into an int/float when it looks like one."""
+    for cast in (int, float):
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    return value
+
+
+def parse_command_flags(command: str) -> dict:
+    """Extract --flag value pairs from a training command."""
+    try:
+        tokens = shlex.split(command)
+    except ValueError:
+        tokens = command.split()
+    flags = {}
+    for i, token in enumerate(tokens):
+        if not token.startswith("--"):
+            continue
+        name, _, value = token[2:].partition("=")
+        if not value:
+            next_token = tokens[i + 1] if i + 1 < len(tokens) else None
+            value = next_token if next_token is not None and not next_token.startswith("--") else "true"
+        flags[name] = _coerce(value)
+    return flags
+
+
+class LogParser:
+    """
+    Incremental parser: feed() one line at a time, get back the records it
+    completed. Call flush() at end of stream to emit a pending epoch block.
+    """
+
+    def __init__(self):
+        self.hyperparameters = {}
+        self.trial = None
+        self.stopped_epoch = None
+        self._epoch = None
+
+    def _context(self) -> dict:
+        return dict(self.hyperparameters)
+
+    def _close_epoch(self) -> list:
+        if self._epoch is None:
+            return []
+        record, self._epoch = self._epoch, None
+        return [record]
+
+    def flush(self) -> list:
+        return self._close_epoch()
+
+    def feed(self, line: str) -> list:
+        stripped = line.strip()
+        if not stripped:
+            return self._close_epoch()
+
+        # Indented fields belong to the current "Epoch i/N" block
+        if self._epoch is not None:
+            match = _EPOCH_FIELD_RE.match(stripped)
+            if match:
+                name, value = match.group(1), match.group(2)
+                setattr(self._epoch, name, int(float(value)) if name == "batches_processed" else float(value))
+                return []
+
+        records = self._close_epoch()
+
+        match = _EPOCH_RE.match(stripped)
+        if match:
+            self._epoch = EpochMetrics(int(match.group(1)), int(match.group(2)), hyperparameters=self._context())
+            return records
+
+        match = _COMMAND_RE.match(stripped)
+        if match:
+            # A new sweep entry resets per-run context
+            self.hyperparameters = parse_command_flags(match.group(3))
+            self.trial = None
+            self.stopped_epoch = None
+            return records
+
+        match = _DATASET_SIZE_RE.match(stripped)
+        if match:
+            self.hyperparameters = {"dataset_size": int(match.group(3))}
+            self.trial = None
+            return records
+
+        match = _STARTING_RE.match(stripped)
+        if match:
+            self.hyperparameters.update(
+                {k: _coerce(v) for k, v in _KEY_VALUE_RE.findall(match.group(1))}
+            )
+            return records
+
+        match = _USING_SEED_RE.match(stripped)
+        if match:
+            self.hyperparameters["seed"] = int(match.group(1))
+            return records
+
+        match = _EARLY_STOP_RE.match(stripped)
+        if match:
+            self.stopped_epoch = int(match.group(1))
+            return records
+
+        match = _BEST_RE.match(stripped)
+        if match:
+            records.append(ScalarMetric("best_val_loss", float(match.group(1)), self._context()))
+            return records
+
+        match = _TRIAL_RE.match(stripped)
+        if match:
+            self.trial = int(match.group(1))
+
+        match = _FINAL_RE.search(stripped)
+        if match:
+            seed_match = _SEED_PREFIX_RE.match(stripped)
+            records.append(FinalMetrics(
+                val_loss=float(match.group(1)),
+                seed=int(seed_match.group(1)) if seed_match else self.hyperparameters.get("seed"),
+                trial=self.trial,
+                stopped_epoch=self.stopped_epoch,
+                hyperparameters=self._context(),
+            ))
+            # Ensembles print one line per seed after a single early-stop line
+            if not seed_match:
+                self.stopped_epoch = None
+        return records
+
+
+class Analyzer:
+    """
+    Parses training logs into typed records.
+
+    Args:
+        llm_fallback: Optional callable(log_text) -> list of records, used only
+            when a log contains nothing the deterministic parser recognizes
+            (see make_openai_fallback)
+    """
+
+    def __init__(self, llm_fallback: Optional[Callable[[str], list]] = None):
+        self.llm_fallback = llm_fallback
+
+    def stream(self, lines: Iterable[Union[str, bytes]]) -> Iterator[Record]:
+        """Yield records as soon as the lines that complete them arrive."""
+        parser = LogParser()
+        for line in lines:
+            if isinstance(line, bytes):
+                line = line.decode(errors="replace")
+            yield from parser.feed(line)
+        yield from parser.flush()
+
+    def parse_logs(self, log_output: str) -> list:
+        """Parse a complete log, falling back to the LLM only if nothing matched."""
+        records = list(self.stream(log_output.splitlines()))
+        if not records and self.llm_fallback is not None and log_output.strip():
+            records = self.llm_fallback(log_output)
+        return records
+
+    @staticmethod
+    def find_best_run(records: Iterable[Record]) -> Optional[FinalMetrics]:
+        """Return the final record with the lowest validation loss."""
+        finals = [r for r in records if isinstance(r, FinalMetrics)]
+        return min(finals, key=lambda r: r.val_loss) if finals else None
+
+
+def make_openai_fallback(client, model: str = "gpt-4o") -> Callable[[str], list]:
+    """Build an llm_fallback that asks an OpenAI chat model to extract final losses."""
+
+    def fallback(log_output: str) -> list:
+        response = client.chat.completions.create(
+            model=model,
+            response_format={"type": "json_object"},
+            messages=[
+                {
+                    "role": "system",
+                    "content": (
+                        "Extract every training run's final validation loss from the logs. "
+                        'Respond ONLY with JSON: {"runs": [{"val_loss": 0.1, "hyperparameters": {}}]}'
+                    ),
+                },
+                {"role": "user", "content": log_output},
+            ],
+        )
+        runs = json.loads(response.choices[0].message.content).get("runs", [])
+        return [
+            FinalMetrics(val_loss=float(run["val_loss"]), hyperparameters=run.get("hyperparameters") or {})
+            for run in runs
+            if run.get("val_loss") is not None
+        ]
+
+    return fallback
+
+
 # TODO: Add statistical analysis functions
 # TODO: Build configuration comparison tools
@@ -6,13 +6,22 @@ This file provides the backend API endpoints for the Trex ML experiment assistan
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel
-from openai import OpenAI
+from openai import AsyncOpenAI, APITimeoutError
 from datetime import datetime
+import asyncio
+import contextlib
+import httpx
 import json
 import time
 import os
+import sys
+
+# Shared helpers (llm_cache, disk_cache) live at the repository root
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from llm_cache import LLMCache, acached_completion
+from tracing import Tracer, token_usage
 
 # Initialize FastAPI app
 app = FastAPI(title="Trex Backend API")
@@ -26,19 +35,72 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request and LLM call latencies, token counts and slot waits (served on /metrics)
+tracer = Tracer()
+
+@app.middleware("http")
+async def trace_requests(request, call_next):
+    """Record every request as an "http <route>" span"""
+    with tracer.span("http unmatched", method=request.method) as span:
+        response = await call_next(request)
+        # Name by the route template, not the raw path, so unknown or
+        # parameterized URLs don't each create new metric series
+        route = request.scope.get("route")
+        if route is not None:
+            span.name = f"http {route.path}"
+        span.set(status=response.status_code)
+        if response.status_code >= 500:
+            span.error = f"HTTP {response.status_code}"
+    return response
+
+# LLM call limits (override with environment variables)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))  # in-flight completions across all requests
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 120))  # seconds per completion call
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", 20))  # pooled HTTP connections
+
+# Waiting for a slot happens on the event loop, so other endpoints stay responsive
+_llm_slots = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+
+@contextlib.asynccontextmanager
+async def _llm_slot(span):
+    """Hold an LLM slot, recording how long the span waited for it"""
+    start = time.perf_counter()
+    async with _llm_slots:
+        span.set(queue_wait=time.perf_counter() - start)
+        yield
+
 # Initialize OpenAI client (lazy initialization - only created when needed)
 _client = None
 
 def get_openai_client():
-    """Get OpenAI client, creating it if it doesn't exist"""
+    """Get the async OpenAI client (with a pooled HTTP transport), creating it if it doesn't exist"""
     global _client
     if _client is None:
         api_key = os.getenv('OPENAI_API_KEY')
         if not api_key:
             raise ValueError("OPENAI_API_KEY environment variable is not set. Please set it with: export OPENAI_API_KEY='your-key-here'")
-        _client = OpenAI(api_key=api_key)
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_CONNECTIONS,
+            ),
+            timeout=LLM_TIMEOUT,
+        )
+        _client = AsyncOpenAI(api_key=api_key, http_client=http_client, timeout=LLM_TIMEOUT)
     return _client
 
+@app.on_event("shutdown")
+async def close_openai_client():
+    """Close pooled connections on shutdown"""
+    if _client is not None:
+        await _client.close()
+
+# Identical planning prompts are answered from disk (see llm_cache.py)
+llm_cache = LLMCache(
+    cache_dir=os.getenv("LLM_CACHE_DIR", ".llm_cache"),
+    ttl=float(os.getenv("LLM_CACHE_TTL", 7 * 24 * 3600)),
+)
+
 # Path to training script (relative to App/backend directory, going up to root)
 SCRIPT_PATH = "../../mnist67/train.py"
 
@@ -47,8 +109,31 @@ async def root():
     """Health check endpoint"""
     return {"status": "ok", "message": "Trex backend is running"}
 
+@app.get("/llm_cache")
+async def llm_cache_stats():
+    """LLM response cache hit/miss counters and API time saved"""
+    return llm_cache.stats()
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: span latency histograms and p50/p95/p99, queue waits, tokens, cache counters"""
+    stats = llm_cache.stats()
+    cache_lines = [
+        "# HELP trex_llm_cache_hits_total LLM responses served from the disk cache",
+        "# TYPE trex_llm_cache_hits_total counter",
+        f"trex_llm_cache_hits_total {stats['hits']}",
+        "# HELP trex_llm_cache_misses_total LLM requests that went to the API",
+        "# TYPE trex_llm_cache_misses_total counter",
+        f"trex_llm_cache_misses_total {stats['misses']}",
+    ]
+    return PlainTextResponse(
+        tracer.prometheus() + "\n".join(cache_lines) + "\n",
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
 class RunExperimentsRequest(BaseModel):
     prompt: str
+    no_cache: bool = False  # Bypass the LLM response cache for this request
 
 @app.post("/run_experiments")
 async def run_experiments(request: RunExperimentsRequest):
@@ -132,14 +217,22 @@ Here is the training script code:
     try:
         # 4️⃣ Ask GPT for structured JSON output
         client = get_openai_client()  # Get client when needed
-        response = client.chat.completions.create(
-            model="gpt-4o",  # Using gpt-4o (gpt-5 doesn't exist)
-            response_format={"type": "json_object"},  # Force JSON output
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": final_user_prompt},
-            ],
-        )
+        with tracer.span("llm_plan", model="gpt-4o") as span:
+            response = await acached_completion(
+                client,
+                llm_cache,
+                bypass=request.no_cache,
+                limiter=_llm_slot(span),
+                model="gpt-4o",  # Using gpt-4o (gpt-5 doesn't exist)
+                response_format={"type": "json_object"},  # Force JSON output
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": final_user_prompt},
+                ],
+            )
+            # The slot (and so queue_wait) is only taken for API calls; cache hits cost no tokens
+            called_api = "queue_wait" in span.attrs
+            span.set(cached=not called_api, **(token_usage(response) if called_api else {}))
 
         # 5️⃣ Parse JSON response
         llm_output = json.loads(response.choices[0].message.content)
@@ -182,6 +275,17 @@ Here is the training script code:
             "runConfigs": run_configs
         }
         
+    except APITimeoutError:
+        return JSONResponse(
+            status_code=504,
+            content={
+                "id": f"msg-{int(time.time() * 1000)}",
+                "role": "assistant",
+                "content": f"Error processing request: the LLM did not respond within {LLM_TIMEOUT:.0f}s",
+                "timestamp": datetime.utcnow().isoformat() + "Z",
+                "runConfigs": []
+            }
+        )
     except ValueError as e:
         # API key not set
         return JSONResponse(
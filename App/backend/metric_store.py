@@ -0,0 +1,408 @@
+"""
+metric_store.py — Columnar per-epoch metric time series
+
+Append-only store for training curves (train_loss, val_loss, ... per epoch)
+so analysis and plotting never re-parse stdout:
+
+- Rows are appended into NumPy column buffers in memory (one per sweep)
+- flush() writes each sweep's buffer as a new immutable part file: Parquet
+  when pyarrow is installed, otherwise a .npz archive of the same columns
+- Every part is listed in the sweep's _manifest.json with its run ids and
+  per-column min/max (or distinct values), so queries skip whole files that
+  cannot match; Parquet parts additionally get row-group filter pushdown
+- Queries load only the requested columns (plus the ones in the predicate)
+
+Columns are flat: run_id, epoch, seed, every metric name and every
+hyperparameter name, so predicates can filter on hyperparameters directly.
+
+Example Interface:
+    store = MetricStore("metrics")
+    store.append("run-1", epoch=1, metrics={"val_loss": 0.4}, hyperparameters={"model_width": 64}, sweep="widths")
+    store.append_records("run-2", analyzer_records, sweep="widths")
+    store.flush()
+    table = store.query(["run_id", "epoch", "val_loss"], where={"model_width": (">=", 64)})
+    epochs, values = store.curve("run-1", "val_loss")
+"""
+
+import json
+import os
+import re
+import threading
+from typing import Iterable, Optional
+
+import numpy as np
+
+from analyzer import EpochMetrics
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet is optional; fall back to .npz parts
+    pa = pq = None
+
+MANIFEST = "_manifest.json"
+
+# Distinct string values kept in the manifest for file skipping
+MAX_DISTINCT = 64
+
+_OPS = {
+    "==": np.equal,
+    "!=": np.not_equal,
+    "<": np.less,
+    "<=": np.less_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+}
+
+_SWEEP_NAME_RE = re.compile(r"[^\w.-]+")
+
+
+def _normalize_predicate(where: Optional[dict]) -> list:
+    """{"width": 64, "lr": ("<", 0.01)} -> [("width", "==", 64), ("lr", "<", 0.01)]."""
+    predicate = []
+    for column, condition in (where or {}).items():
+        if isinstance(condition, tuple) and len(condition) == 2 and condition[0] in (*_OPS, "in"):
+            op, value = condition
+        elif isinstance(condition, (list, set, frozenset)):
+            op, value = "in", list(condition)
+        else:
+            op, value = "==", condition
+        predicate.append((column, op, value))
+    return predicate
+
+
+def _is_numeric(value) -> bool:
+    return isinstance(value, (bool, int, float, np.integer, np.floating))
+
+
+class _ColumnBuffer:
+    """Growable NumPy columns; numeric columns are float64 (NaN = missing), others object (None = missing)."""
+
+    def __init__(self, capacity: int = 256):
+        self.capacity = capacity
+        self.size = 0
+        self.columns = {}
+
+    def _grow(self):
+        self.capacity *= 2
+        for name, column in self.columns.items():
+            grown = self._empty(column.dtype, self.capacity)
+            grown[: self.size] = column[: self.size]
+            self.columns[name] = grown
+
+    @staticmethod
+    def _empty(dtype, capacity):
+        if dtype == object:
+            return np.full(capacity, None, dtype=object)
+        return np.full(capacity, np.nan)
+
+    def append(self, row: dict):
+        if self.size == self.capacity:
+            self._grow()
+        for name, value in row.items():
+            if value is None:
+                continue
+            column = self.columns.get(name)
+            numeric = _is_numeric(value)
+            if column is None:
+                column = self.columns[name] = self._empty(float if numeric else object, self.capacity)
+            elif not numeric and column.dtype != object:
+                # A non-numeric value turns the whole column into an object column
+                column = column.astype(object)
+                column[np.isnan(column.astype(float))] = None
+                self.columns[name] = column
+            column[self.size] = float(value) if numeric and column.dtype != object else value
+        self.size += 1
+
+    def snapshot(self) -> dict:
+        return {name: column[: self.size] for name, column in self.columns.items()}
+
+    def clear(self):
+        self.size = 0
+        self.columns = {}
+
+
+def _column_stats(column: np.ndarray) -> dict:
+    """Manifest statistics used to skip part files that cannot match a predicate."""
+    if column.dtype != object:
+        present = column[~np.isnan(column)]
+        if not len(present):
+            return {"kind": "numeric", "min": None, "max": None}
+        return {"kind": "numeric", "min": float(present.min()), "max": float(present.max())}
+    values = {v for v in column if v is not None}
+    if len(values) <= MAX_DISTINCT:
+        return {"kind": "values", "values": sorted(map(str, values))}
+    return {"kind": "unknown"}
+
+
+def _may_match(stats: Optional[dict], op: str, value) -> bool:
+    """False only when the statistics prove no row of the part satisfies (op, value)."""
+    if stats is None:
+        return False  # column absent from the part: every row is null
+    if stats["kind"] == "numeric":
+        low, high = stats["min"], stats["max"]
+        if low is None:
+            return False
+        values = value if op == "in" else [value]
+        if not all(_is_numeric(v) for v in values):
+            return op == "!="
+        if op in ("==", "in"):
+            return any(low <= v <= high for v in values)
+        if op == "<":
+            return low < value
+        if op == "<=":
+            return low <= value
+        if op == ">":
+            return high > value
+        if op == ">=":
+            return high >= value
+        return True
+    if stats["kind"] == "values":
+        if op == "==":
+            return str(value) in stats["values"]
+        if op == "in":
+            return any(str(v) in stats["values"] for v in value)
+    return True
+
+
+def _mask(columns: dict, predicate: list, size: int) -> np.ndarray:
+    mask = np.ones(size, dtype=bool)
+    for name, op, value in predicate:
+        column = columns.get(name)
+        if column is None:
+            return np.zeros(size, dtype=bool)
+        if op == "in" and column.dtype == object:
+            allowed = set(value)  # hash lookups; np.isin sorts object arrays, which is slow
+            mask &= np.fromiter((v in allowed for v in column), dtype=bool, count=size)
+        elif op == "in":
+            mask &= np.isin(column, list(value))
+        else:
+            with np.errstate(invalid="ignore"):
+                mask &= np.asarray(_OPS[op](column, value), dtype=bool)
+    return mask
+
+
+class MetricStore:
+    """
+    Args:
+        root: Directory with one subdirectory of part files per sweep
+        format: "parquet" or "npz" (default: parquet when pyarrow is installed)
+    """
+
+    def __init__(self, root: str = ".metric_store", format: Optional[str] = None):
+        self.root = root
+        self.format = format or ("parquet" if pq is not None else "npz")
+        if self.format == "parquet" and pq is None:
+            raise ImportError("pyarrow is required for format='parquet' (pip install pyarrow)")
+        self._buffers = {}
+        self._lock = threading.Lock()
+        self.version = 0  # bumped on every append, for caches of derived data
+        self._run_versions = {}  # run_id -> self.version at its latest append
+        os.makedirs(root, exist_ok=True)
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def append(self, run_id: str, epoch: int, metrics: dict, hyperparameters: Optional[dict] = None,
+               sweep: str = "default", seed: Optional[int] = None):
+        """Append one epoch's metrics for a run."""
+        row = {**(hyperparameters or {}), **metrics, "run_id": run_id, "epoch": epoch, "seed": seed}
+        with self._lock:
+            self._buffers.setdefault(sweep, _ColumnBuffer()).append(row)
+            self.version += 1
+            self._run_versions[run_id] = self.version
+
+    def run_versions(self, run_ids: Iterable) -> tuple:
+        """Version of each run's latest append (None if it has none), in the order given."""
+        with self._lock:
+            return tuple(self._run_versions.get(run_id) for run_id in run_ids)
+
+    def manifest_versions(self) -> tuple:
+        """(sweep directory, manifest mtime) of every sweep on disk; changes when any process writes a part."""
+        versions = []
+        for entry in os.scandir(self.root):
+            try:
+                versions.append((entry.name, os.stat(os.path.join(entry.path, MANIFEST)).st_mtime_ns))
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+        return tuple(sorted(versions))
+
+    def append_records(self, run_id: str, records: Iterable, sweep: str = "default"):
+        """Append the EpochMetrics among analyzer records (other record types are ignored)."""
+        for record in records:
+            if not isinstance(record, EpochMetrics):
+                continue
+            metrics = {
+                name: getattr(record, name)
+                for name in ("train_loss", "val_loss", "lr", "batches_processed")
+                if getattr(record, name) is not None
+            }
+            self.append(run_id, record.epoch, metrics, record.hyperparameters, sweep,
+                        seed=record.hyperparameters.get("seed"))
+
+    def append_events(self, run_id: str, events: Iterable[dict], hyperparameters: Optional[dict] = None,
+                      sweep: str = "default"):
+        """Append the "epoch" events of a mnist67/train.py structured metrics stream."""
+        for event in events:
+            if event.get("event") != "epoch":
+                continue
+            metrics = {k: v for k, v in event.items() if k not in ("event", "epoch", "seed")}
+            self.append(run_id, event["epoch"], metrics, hyperparameters, sweep, seed=event.get("seed"))
+
+    def _sweep_dir(self, sweep: str) -> str:
+        return os.path.join(self.root, _SWEEP_NAME_RE.sub("_", sweep))
+
+    def _read_manifest(self, sweep_dir: str) -> dict:
+        try:
+            with open(os.path.join(sweep_dir, MANIFEST)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"parts": []}
+
+    def flush(self, sweep: Optional[str] = None) -> list:
+        """Write buffered rows (of one sweep, or all) as new part files; return their paths."""
+        with self._lock:
+            sweeps = [sweep] if sweep is not None else list(self._buffers)
+            written = []
+            for name in sweeps:
+                buffer = self._buffers.get(name)
+                if buffer is None or buffer.size == 0:
+                    continue
+                written.append(self._write_part(name, buffer.snapshot()))
+                buffer.clear()
+            return written
+
+    def _write_part(self, sweep: str, columns: dict) -> str:
+        sweep_dir = self._sweep_dir(sweep)
+        os.makedirs(sweep_dir, exist_ok=True)
+        manifest = self._read_manifest(sweep_dir)
+        manifest["sweep"] = sweep
+        filename = f"part-{len(manifest['parts']):05d}.{self.format}"
+        path = os.path.join(sweep_dir, filename)
+        tmp_path = f"{path}.tmp"
+
+        if self.format == "parquet":
+            table = pa.table({
+                name: pa.array([None if v is None else str(v) for v in column], type=pa.string())
+                if column.dtype == object else column
+                for name, column in columns.items()
+            })
+            pq.write_table(table, tmp_path, row_group_size=4096)
+        else:
+            with open(tmp_path, "wb") as f:
+                np.savez(f, **{name: column.astype(str) if column.dtype == object else column
+                               for name, column in columns.items()})
+        os.replace(tmp_path, path)
+
+        manifest["parts"].append({
+            "file": filename,
+            "rows": len(columns["run_id"]),
+            "runs": sorted(set(columns["run_id"])),
+            "stats": {name: _column_stats(column) for name, column in columns.items()},
+        })
+        manifest_tmp = os.path.join(sweep_dir, f"{MANIFEST}.tmp")
+        with open(manifest_tmp, "w") as f:
+            json.dump(manifest, f)
+        os.replace(manifest_tmp, os.path.join(sweep_dir, MANIFEST))
+        return path
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def sweeps(self) -> list:
+        names = set(self._buffers)
+        for entry in os.scandir(self.root):
+            # Skip stray files (README, .DS_Store) and directories that aren't sweeps
+            if not entry.is_dir() or not os.path.exists(os.path.join(entry.path, MANIFEST)):
+                continue
+            manifest = self._read_manifest(entry.path)
+            if manifest["parts"]:
+                names.add(manifest.get("sweep", entry.name))
+        return sorted(names)
+
+    def _read_part(self, path: str, columns: Optional[list], predicate: list) -> dict:
+        needed = None if columns is None else list(dict.fromkeys([*columns, *(c for c, _, _ in predicate)]))
+        if path.endswith(".parquet"):
+            schema_names = pq.read_schema(path).names
+            present = None if needed is None else [c for c in needed if c in schema_names]
+            filters = [(c, op, v) for c, op, v in predicate if c in schema_names] or None
+            table = pq.read_table(path, columns=present, filters=filters)
+            data = {name: table.column(name).to_numpy(zero_copy_only=False) for name in table.column_names}
+        else:
+            with np.load(path, allow_pickle=False) as archive:
+                data = {name: archive[name] for name in archive.files if needed is None or name in needed}
+            # .npz stores string columns as fixed-width text; restore None for missing values
+            for name, column in data.items():
+                if column.dtype.kind == "U":
+                    column = column.astype(object)
+                    column[column == "None"] = None
+                    data[name] = column
+        return data
+
+    def query(
+        self,
+        columns: Optional[list] = None,
+        where: Optional[dict] = None,
+        runs: Optional[Iterable[str]] = None,
+        sweeps: Optional[Iterable[str]] = None,
+    ) -> dict:
+        """
+        Load matching rows as {column: array}.
+
+        Args:
+            columns: Columns to return (None returns every column)
+            where: {column: value | (op, value) | [values]} with op in
+                ==, !=, <, <=, >, >=, in
+            runs: Only these run ids
+            sweeps: Only these sweeps (default: all)
+
+        Returns:
+            Dict of equally long NumPy arrays (rows from parts and the
+            unflushed buffer, in append order)
+        """
+        predicate = _normalize_predicate(where)
+        if runs is not None:
+            runs = list(runs)
+            predicate.append(("run_id", "in", runs))
+
+        chunks = []
+        for sweep in (list(sweeps) if sweeps is not None else self.sweeps()):
+            sweep_dir = self._sweep_dir(sweep)
+            for part in self._read_manifest(sweep_dir)["parts"]:
+                if runs is not None and not set(runs) & set(part["runs"]):
+                    continue
+                if not all(_may_match(part["stats"].get(c), op, v) for c, op, v in predicate):
+                    continue
+                chunks.append(self._read_part(os.path.join(sweep_dir, part["file"]), columns, predicate))
+            with self._lock:
+                buffer = self._buffers.get(sweep)
+                if buffer is not None and buffer.size:
+                    chunks.append({name: column.copy() for name, column in buffer.snapshot().items()})
+
+        names = columns or list(dict.fromkeys(name for chunk in chunks for name in chunk))
+        result = {name: [] for name in names}
+        for chunk in chunks:
+            size = len(next(iter(chunk.values()))) if chunk else 0
+            mask = _mask(chunk, predicate, size)
+            for name in names:
+                column = chunk.get(name)
+                if column is None:
+                    column = np.full(size, np.nan)
+                result[name].append(column[mask])
+        return {
+            name: np.concatenate(parts) if parts else np.array([])
+            for name, parts in result.items()
+        }
+
+    def curve(self, run_id: str, metric: str, sweep: Optional[str] = None, seed: Optional[int] = None):
+        """Return (epochs, values) for one run's metric, sorted by epoch and without missing values."""
+        where = {"seed": seed} if seed is not None else None
+        table = self.query(["epoch", metric], where=where, runs=[run_id],
+                           sweeps=[sweep] if sweep is not None else None)
+        epochs = table["epoch"].astype(float)
+        values = table[metric].astype(float)
+        keep = ~np.isnan(values)
+        order = np.argsort(epochs[keep], kind="stable")
+        return epochs[keep][order], values[keep][order]
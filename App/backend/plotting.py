@@ -1,34 +1,218 @@
 """
-plotting.py — Plotly chart generation (placeholder)
-
-This module should handle:
-- Generating Plotly JSON from training metrics
-- Creating training/validation loss curves
-- Building learning rate schedules
-- Comparing multiple runs on same chart
-- Customizing dark theme for Trex UI
-
-Backend Implementation Steps:
-1. Parse metrics from storage or log files
-2. Build Plotly data structures (traces)
-3. Configure layout with proper styling
-4. Support multiple chart types (line, scatter, bar)
-5. Apply dark theme colors matching frontend (#00143c, #00b4f0, #b428ff)
-6. Return JSON-serializable Plotly figure
+plotting.py — Plotly chart generation
+
+Builds Plotly figure JSON for the frontend PlotViewer from the per-epoch
+curves in metric_store.MetricStore:
+
+- Training/validation loss curves for one run, or one metric across runs
+- Every trace is downsampled server-side with Largest-Triangle-Three-Buckets
+  (LTTB) to at most max_points points, which keeps peaks and the overall
+  shape while bounding what the browser has to draw
+- Dark Trex theme (#00143c background, #00b4f0 / #b428ff accents)
+- Serialized figures are cached (LRU) keyed by the run set and the runs'
+  last update, so reopening a chart does no work until new data arrives
 
 Example Interface:
-    plotter = Plotter()
+    plotter = Plotter(metric_store, storage)
     plot_json = plotter.create_training_plot(run_id)
     # Returns: {"data": [...], "layout": {...}}
-    
-    multi_plot = plotter.compare_runs([run1, run2, run3])
 
-This file is intentionally left incomplete for backend teammates to implement.
+    multi_plot = plotter.compare_runs([run1, run2, run3])
 """
 
-# TODO: Implement Plotter class
-# TODO: Add Plotly figure generation
-# TODO: Create training curve builders
-# TODO: Apply Trex color scheme
-# TODO: Add comparison plot functionality
-# TODO: Ensure JSON serialization works correctly
+import json
+import threading
+from collections import OrderedDict
+from typing import Optional, Sequence
+
+import numpy as np
+
+TREX_BACKGROUND = "#00143c"
+TREX_COLORS = ["#00b4f0", "#b428ff", "#ff7f0e", "#2ca02c", "#d62728", "#e377c2", "#bcbd22", "#17becf"]
+
+TREX_LAYOUT = {
+    "paper_bgcolor": TREX_BACKGROUND,
+    "plot_bgcolor": TREX_BACKGROUND,
+    "font": {"color": "#e6ecff"},
+    "colorway": TREX_COLORS,
+    "hovermode": "x unified",
+    "legend": {"bgcolor": "rgba(0,0,0,0)"},
+    "margin": {"l": 60, "r": 20, "t": 50, "b": 50},
+}
+
+_AXIS_STYLE = {"gridcolor": "rgba(0,180,240,0.15)", "zerolinecolor": "rgba(0,180,240,0.3)"}
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int):
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+
+    Keeps the first and last point and, from each of threshold - 2 equal
+    buckets in between, the point forming the largest triangle with the
+    previously kept point and the mean of the next bucket.
+
+    Returns:
+        (x, y) with at most threshold points (inputs unchanged if already smaller)
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return x, y
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)  # bucket boundaries over the interior
+    # Mean of each bucket, used as the third triangle vertex for the bucket before it
+    sums_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    mean_x = np.append(sums_x / counts, x[-1])
+    mean_y = np.append(sums_y / counts, y[-1])
+
+    keep = np.empty(threshold, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        ax, ay = x[previous], y[previous]
+        cx, cy = mean_x[bucket + 1], mean_y[bucket + 1]
+        areas = np.abs((ax - cx) * (y[start:stop] - ay) - (ax - x[start:stop]) * (cy - ay))
+        previous = start + int(np.argmax(areas))
+        keep[bucket + 1] = previous
+    return x[keep], y[keep]
+
+
+class Plotter:
+    """
+    Args:
+        metric_store: metric_store.MetricStore holding the per-epoch curves
+        storage: Optional storage.Storage; the runs' updated_at timestamps
+            are part of the figure cache key (with the runs' metric store
+            versions)
+        max_points: Point budget per trace after downsampling
+        cache_size: Number of serialized figures kept
+    """
+
+    def __init__(self, metric_store, storage=None, max_points: int = 1000, cache_size: int = 128):
+        self.metric_store = metric_store
+        self.storage = storage
+        self.max_points = max_points
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def create_training_plot(self, run_id: str, metrics: Sequence[str] = ("train_loss", "val_loss"),
+                             serialized: bool = False):
+        """
+        Loss curves of one run (one trace per metric, and per seed for ensembles).
+
+        Args:
+            serialized: Return the cached JSON string instead of a dict (for
+                endpoints that can send it as-is)
+        """
+        key = ("training", (run_id,), tuple(metrics), self.max_points)
+        return self._cached(key, [run_id], lambda: self._training_figure(run_id, metrics), serialized)
+
+    def compare_runs(self, run_ids: Sequence[str], metric: str = "val_loss", serialized: bool = False):
+        """One metric of several runs on a shared chart."""
+        run_ids = list(dict.fromkeys(run_ids))
+        # Trace order and colors follow run_ids, so the order is part of the key
+        key = ("compare", tuple(run_ids), metric, self.max_points)
+        return self._cached(key, run_ids, lambda: self._compare_figure(run_ids, metric), serialized)
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+    # ------------------------------------------------------------------
+    # Figure builders
+    # ------------------------------------------------------------------
+
+    def _trace(self, name: str, epochs: np.ndarray, values: np.ndarray, color: str, dash: Optional[str] = None):
+        x, y = lttb(epochs, values, self.max_points)
+        line = {"color": color, "width": 2}
+        if dash:
+            line["dash"] = dash
+        return {"type": "scatter", "mode": "lines", "name": name, "x": x.tolist(), "y": y.tolist(), "line": line}
+
+    def _layout(self, title: str, y_title: str) -> dict:
+        return {
+            **TREX_LAYOUT,
+            "title": title,
+            "xaxis": {"title": "Epoch", **_AXIS_STYLE},
+            "yaxis": {"title": y_title, **_AXIS_STYLE},
+        }
+
+    def _training_figure(self, run_id: str, metrics: Sequence[str]) -> dict:
+        table = self.metric_store.query(["epoch", "seed", *metrics], runs=[run_id])
+        seeds = [s for s in np.unique(table["seed"].astype(float)) if not np.isnan(s)] or [None]
+        data = []
+        for m, metric in enumerate(metrics):
+            for s, seed in enumerate(seeds):
+                rows = np.ones(len(table["epoch"]), dtype=bool) if seed is None else table["seed"] == seed
+                epochs, values = self._sorted_curve(table["epoch"][rows], table[metric][rows])
+                if not len(epochs):
+                    continue
+                name = metric if seed is None or len(seeds) == 1 else f"{metric} (seed {int(seed)})"
+                color = TREX_COLORS[(m if len(seeds) == 1 else s) % len(TREX_COLORS)]
+                data.append(self._trace(name, epochs, values, color, dash="dot" if m and len(seeds) > 1 else None))
+        return {"data": data, "layout": self._layout(f"Training curves — {run_id}", "Loss")}
+
+    def _compare_figure(self, run_ids: Sequence[str], metric: str) -> dict:
+        table = self.metric_store.query(["run_id", "epoch", metric], runs=run_ids)
+        rows_by_run = {}
+        for row, run_id in enumerate(table["run_id"]):
+            rows_by_run.setdefault(run_id, []).append(row)
+        data = []
+        for i, run_id in enumerate(run_ids):
+            rows = rows_by_run.get(run_id, [])
+            epochs, values = self._sorted_curve(table["epoch"][rows], table[metric][rows])
+            if len(epochs):
+                data.append(self._trace(run_id, epochs, values, TREX_COLORS[i % len(TREX_COLORS)]))
+        return {"data": data, "layout": self._layout(f"{metric} across {len(run_ids)} runs", metric)}
+
+    @staticmethod
+    def _sorted_curve(epochs: np.ndarray, values: np.ndarray):
+        epochs, values = epochs.astype(float), values.astype(float)
+        keep = ~np.isnan(values)
+        order = np.argsort(epochs[keep], kind="stable")
+        return epochs[keep][order], values[keep][order]
+
+    # ------------------------------------------------------------------
+    # Figure cache
+    # ------------------------------------------------------------------
+
+    def _data_version(self, run_ids: Sequence[str]):
+        """Changes whenever any of the runs gets new data.
+
+        Appends made through this process's metric store are tracked per run.
+        Parts written by other processes only show up through the runs'
+        updated_at in storage, so without storage the sweep manifests'
+        modification times are part of the version too (any new part then
+        invalidates every cached figure).
+        """
+        if self.storage is not None:
+            updated = self.storage.last_updated(run_ids)
+            on_disk = tuple(updated.get(run_id) for run_id in run_ids)
+        else:
+            on_disk = self.metric_store.manifest_versions()
+        return on_disk, self.metric_store.run_versions(run_ids)
+
+    def _cached(self, key, run_ids, build, serialized: bool):
+        version = self._data_version(run_ids)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[0] == version:
+                self._cache.move_to_end(key)
+                payload = entry[1]
+            else:
+                payload = None
+        if payload is None:
+            payload = json.dumps(build(), separators=(",", ":"))
+            with self._lock:
+                self._cache[key] = (version, payload)
+                self._cache.move_to_end(key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return payload if serialized else json.loads(payload)
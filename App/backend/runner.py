@@ -1,34 +1,408 @@
 """
-runner.py — Job execution engine (placeholder)
-
-This module should handle:
-- Spawning training processes using subprocess
-- Managing concurrent job execution
-- Monitoring job status (pending → running → completed/failed)
-- Capturing stdout/stderr from training scripts
-- Updating job status in storage
-
-Backend Implementation Steps:
-1. Create JobRunner class to manage subprocess execution
-2. Implement queue system for pending jobs
-3. Add process monitoring with status updates
-4. Capture and parse training output (loss values, metrics)
-5. Handle process failures and timeouts
-6. Update storage with job status and results
-7. Emit WebSocket events for log streaming
+runner.py — Job execution engine
+
+Runs training scripts as subprocesses from a priority queue with a fixed
+number of worker slots:
+
+- Status transitions: pending → running → completed / failed
+  (cancelled and timed-out jobs end up "failed" with an error message)
+- Wall-clock timeouts kill the job's whole process group
+- Each job gets a CPU thread budget (OMP_NUM_THREADS / MKL_NUM_THREADS, which
+  torch uses for its intra-op pool) so overlapping runs don't oversubscribe
+  the host, and can optionally be pinned to its own set of CPUs
+- stdout/stderr are captured line by line and parsed with analyzer.LogParser
+- Storage (if given) is updated on every status change and receives the
+  captured output and final metrics
+- Each job's CPU time, peak RSS, context switches and block I/O are taken
+  from its rusage when it exits (stored under the run's "rusage" metric);
+  resource_summary() aggregates them over a set of jobs
 
 Example Interface:
-    runner = JobRunner(storage_instance)
-    job_id = runner.submit_job(config)
+    runner = JobRunner(storage_instance, max_workers=4)
+    job_id = runner.submit_job({"lr": 0.001, "epochs": 5}, priority=0, timeout=600)
     status = runner.get_status(job_id)
     runner.cancel_job(job_id)
-
-This file is intentionally left incomplete for backend teammates to implement.
+    print(runner.resource_summary())
 """
 
-# TODO: Implement JobRunner class
-# TODO: Add subprocess management for training scripts
-# TODO: Implement job queue and scheduling
-# TODO: Add log capture and parsing
-# TODO: Integrate with storage for status updates
-# TODO: Add WebSocket log streaming
+import heapq
+import itertools
+import logging
+import os
+import shlex
+import signal
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from analyzer import FinalMetrics, LogParser
+
+# Shared helpers (resources, streaming) live at the repository root
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from resources import aggregate_usage, wait_with_rusage  # noqa: E402
+from streaming import read_lines  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sample_scripts", "train_example.py")
+
+# Grace period between SIGTERM and SIGKILL when stopping a job
+KILL_GRACE_SECONDS = 5.0
+
+
+@dataclass
+class Job:
+    id: str
+    command: str
+    config: dict
+    priority: int = 0
+    timeout: Optional[float] = None
+    status: str = "pending"
+    error: Optional[str] = None
+    returncode: Optional[int] = None
+    stdout: list = field(default_factory=list)
+    stderr: list = field(default_factory=list)
+    records: list = field(default_factory=list)
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    rusage: Optional[dict] = None
+    cancel_requested: bool = False
+    process: Optional[subprocess.Popen] = None
+
+
+def build_command(config: dict, script: str = DEFAULT_SCRIPT) -> str:
+    """Turn a run config into "python script --key value ..."."""
+    flags = " ".join(f"--{key} {shlex.quote(str(value))}" for key, value in config.items())
+    return f"{shlex.quote(sys.executable)} {shlex.quote(script)} {flags}".strip()
+
+
+class JobRunner:
+    """
+    Args:
+        storage: Optional storage.Storage updated on status/metric changes
+        max_workers: Number of jobs allowed to run at once
+        threads_per_job: CPU threads per job (default: cpu_count // max_workers)
+        pin_cpus: Pin each worker slot's jobs to a disjoint set of CPUs (Linux only)
+        on_log: Optional callback(job_id, stream, line) for live log streaming
+        metric_store: Optional metric_store.MetricStore that receives each
+            job's per-epoch metrics (flushed whenever the queue drains)
+        tracer: Optional tracing.Tracer; every finished job is recorded as a
+            "job" span with its queue wait
+    """
+
+    def __init__(
+        self,
+        storage=None,
+        max_workers: int = 2,
+        threads_per_job: Optional[int] = None,
+        pin_cpus: bool = False,
+        on_log: Optional[Callable[[str, str, str], None]] = None,
+        metric_store=None,
+        tracer=None,
+    ):
+        self.storage = storage
+        self.max_workers = max_workers
+        cpu_count = os.cpu_count() or 1
+        self.threads_per_job = threads_per_job or max(1, cpu_count // max_workers)
+        self.pin_cpus = pin_cpus and hasattr(os, "sched_setaffinity")
+        self.on_log = on_log
+        self.metric_store = metric_store
+        self.tracer = tracer
+
+        self._jobs = {}
+        self._queue = []  # heap of (priority, sequence, job_id); lower priority runs first
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._has_work = threading.Condition(self._lock)
+        self._shutdown = False
+        self._workers = [
+            threading.Thread(target=self._worker, args=(slot,), daemon=True, name=f"job-runner-{slot}")
+            for slot in range(max_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def submit_job(
+        self,
+        config: Optional[dict] = None,
+        command: Optional[str] = None,
+        script: str = DEFAULT_SCRIPT,
+        priority: int = 0,
+        timeout: Optional[float] = None,
+        job_id: Optional[str] = None,
+    ) -> str:
+        """Queue a job from a config (or an explicit command) and return its id."""
+        config = config or {}
+        job = Job(
+            id=job_id or f"run-{uuid.uuid4().hex[:8]}",
+            command=command or build_command(config, script),
+            config=config,
+            priority=priority,
+            timeout=timeout,
+        )
+        # Create the stored run before any worker can move it to "running"
+        if self.storage is not None:
+            self.storage.create_run(job.config, run_id=job.id, command=job.command)
+        with self._lock:
+            self._jobs[job.id] = job
+            heapq.heappush(self._queue, (priority, next(self._sequence), job.id))
+            self._has_work.notify()
+        return job.id
+
+    def get_status(self, job_id: str) -> Optional[dict]:
+        """Return a snapshot of a job's state, or None for an unknown id."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return self._snapshot(job)
+
+    def list_jobs(self) -> list:
+        with self._lock:
+            return [self._snapshot(job) for job in self._jobs.values()]
+
+    def cancel_job(self, job_id: str) -> bool:
+        """Cancel a pending or running job. Returns False if it already finished."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in ("completed", "failed"):
+                return False
+            job.cancel_requested = True
+            queued = job.status == "pending"
+            if queued:
+                # Still queued: the worker will skip it when popped
+                self._finish(job, "failed", error="cancelled")
+            process = job.process
+        if queued:
+            self._notify_storage(job)
+        elif process is not None:
+            self._kill(process)
+        return True
+
+    def resource_summary(self, job_ids: Optional[list] = None) -> dict:
+        """Aggregate resource usage of finished jobs (all, or the given ids); see resources.aggregate_usage."""
+        with self._lock:
+            jobs = self._jobs.values() if job_ids is None else [self._jobs[i] for i in job_ids if i in self._jobs]
+            usages = [job.rusage for job in jobs]
+        return aggregate_usage(usages, cpu_count=len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else None)
+
+    def shutdown(self, cancel_running: bool = True):
+        """Stop the workers (optionally killing running jobs)."""
+        with self._lock:
+            self._shutdown = True
+            self._has_work.notify_all()
+            running = [job.id for job in self._jobs.values() if job.status == "running"]
+        if cancel_running:
+            for job_id in running:
+                self.cancel_job(job_id)
+        for worker in self._workers:
+            worker.join()
+        if self.metric_store is not None:
+            self.metric_store.flush()
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _snapshot(job: Job) -> dict:
+        finals = [r for r in job.records if isinstance(r, FinalMetrics)]
+        return {
+            "id": job.id,
+            "status": job.status,
+            "command": job.command,
+            "config": job.config,
+            "priority": job.priority,
+            "error": job.error,
+            "returncode": job.returncode,
+            "val_loss": finals[-1].val_loss if finals else None,
+            "stdout": "".join(job.stdout),
+            "stderr": "".join(job.stderr),
+            "created_at": job.created_at,
+            "started_at": job.started_at,
+            "finished_at": job.finished_at,
+            "rusage": job.rusage,
+        }
+
+    def _notify_storage(self, job: Job):
+        if self.storage is not None:
+            self.storage.update_run_status(job.id, job.status, error=job.error)
+
+    def _finish(self, job: Job, status: str, error: Optional[str] = None):
+        """Record a terminal state. Caller holds the lock."""
+        job.status = status
+        job.error = error
+        job.finished_at = time.time()
+        job.process = None
+
+    def _cpus_for_slot(self, slot: int):
+        cpus = sorted(os.sched_getaffinity(0))
+        start = (slot * self.threads_per_job) % len(cpus)
+        return {cpus[(start + i) % len(cpus)] for i in range(self.threads_per_job)}
+
+    def _worker(self, slot: int):
+        while True:
+            with self._lock:
+                while not self._queue and not self._shutdown:
+                    self._has_work.wait()
+                if self._shutdown:
+                    return
+                _, _, job_id = heapq.heappop(self._queue)
+                job = self._jobs[job_id]
+                if job.status != "pending":
+                    continue  # cancelled while queued
+                job.status = "running"
+                job.started_at = time.time()
+            self._notify_storage(job)
+            try:
+                self._run(job, slot)
+            except Exception as e:
+                # Keep the worker alive; the job must not stay "running" forever
+                logger.exception("Job %s failed in the runner", job.id)
+                with self._lock:
+                    if job.process is not None and job.process.poll() is None:
+                        self._kill(job.process)
+                    self._finish(job, "failed", error=f"runner error: {e}")
+                self._notify_storage(job)
+            if self.tracer is not None:
+                self.tracer.record(
+                    "job",
+                    (job.finished_at or time.time()) - job.started_at,
+                    error=job.error or (None if job.status == "completed" else job.status),
+                    queue_wait=job.started_at - job.created_at,
+                    job_id=job.id,
+                )
+
+    def _run(self, job: Job, slot: int):
+        threads = str(self.threads_per_job)
+        env = {
+            **os.environ,
+            "OMP_NUM_THREADS": threads,
+            "MKL_NUM_THREADS": threads,
+            "PYTHONUNBUFFERED": "1",
+        }
+        started = time.perf_counter()
+        try:
+            process = subprocess.Popen(
+                shlex.split(job.command),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                env=env,
+                start_new_session=True,  # own process group, so timeouts kill grandchildren too
+            )
+        except OSError as e:
+            with self._lock:
+                self._finish(job, "failed", error=f"failed to start: {e}")
+            self._notify_storage(job)
+            return
+
+        if self.pin_cpus:
+            try:
+                os.sched_setaffinity(process.pid, self._cpus_for_slot(slot))
+            except OSError:
+                pass
+
+        with self._lock:
+            job.process = process
+            cancelled = job.cancel_requested
+        if cancelled:
+            self._kill(process)
+
+        timed_out = self._capture(job, process)
+        returncode, rusage = wait_with_rusage(process, started)
+
+        with self._lock:
+            job.returncode = returncode
+            job.rusage = rusage
+            if job.cancel_requested:
+                outcome = ("failed", "cancelled")
+            elif timed_out:
+                outcome = ("failed", f"timed out after {job.timeout}s")
+            elif returncode != 0:
+                outcome = ("failed", f"exited with code {returncode}")
+            else:
+                outcome = ("completed", None)
+            records = list(job.records)
+            stdout, stderr = "".join(job.stdout), "".join(job.stderr)
+
+        # Store output and metrics before publishing the final status, so a
+        # client that sees "completed" also sees the results
+        if self.metric_store is not None:
+            self.metric_store.append_records(job.id, records, sweep="jobs")
+
+        if self.storage is not None:
+            self.storage.update_run_output(job.id, stdout, stderr)
+            finals = [r for r in records if isinstance(r, FinalMetrics)]
+            metrics = {"val_loss": finals[-1].val_loss} if finals else {}
+            if rusage is not None:
+                metrics["rusage"] = rusage
+            if metrics:
+                self.storage.update_run_metrics(job.id, metrics)
+                # Metric updates are batched; commit them before the status changes
+                self.storage.flush()
+
+        with self._lock:
+            self._finish(job, *outcome)
+            drained = not self._queue and not any(j.status == "running" for j in self._jobs.values())
+        self._notify_storage(job)
+
+        if self.metric_store is not None and drained:
+            self.metric_store.flush()
+
+    def _capture(self, job: Job, process: subprocess.Popen) -> bool:
+        """Read both pipes line by line until EOF; return True if the job timed out."""
+        parser = LogParser()
+        timed_out = threading.Event()
+        timer = None
+        if job.timeout:
+            def expire():
+                timed_out.set()
+                self._kill(process)
+
+            timer = threading.Timer(max(0.0, job.started_at + job.timeout - time.time()), expire)
+            timer.daemon = True
+            timer.start()
+        try:
+            for name, line in read_lines({"stdout": process.stdout, "stderr": process.stderr}):
+                if self.on_log is not None:
+                    self.on_log(job.id, name, line)
+                with self._lock:
+                    getattr(job, name).append(line + "\n")
+                    if name == "stdout":
+                        job.records.extend(parser.feed(line))
+        finally:
+            if timer is not None:
+                timer.cancel()
+            process.stdout.close()
+            process.stderr.close()
+        with self._lock:
+            job.records.extend(parser.flush())
+        return timed_out.is_set()
+
+    @staticmethod
+    def _kill(process: subprocess.Popen):
+        """SIGTERM the job's process group, then SIGKILL it after a grace period."""
+        try:
+            os.killpg(process.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            return
+
+        def force_kill():
+            try:
+                process.wait(timeout=KILL_GRACE_SECONDS)
+            except subprocess.TimeoutExpired:
+                try:
+                    os.killpg(process.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+        threading.Thread(target=force_kill, daemon=True).start()
@@ -1,41 +1,402 @@
 """
-storage.py — Data persistence layer (placeholder)
-
-This module should handle:
-- Storing run configurations and results
-- Querying runs by ID, status, or config
-- Saving training logs and metrics
-- Managing chat message history
-- Optional: PostgreSQL integration for production
-
-Backend Implementation Steps:
-1. Choose storage backend (SQLite for dev, PostgreSQL for prod)
-2. Define schema matching shared/schemas.py
-3. Implement CRUD operations for runs
-4. Add message storage for chat history
-5. Create indexes for efficient querying
-6. Add migration support if using SQL
+storage.py — Data persistence layer
+
+SQLite-backed storage for runs and chat history:
+
+- WAL journal mode, so the UI can list runs while sweeps are writing
+  (readers use their own per-thread connection and never block the writer)
+- Metric updates from many concurrent jobs are queued, merged per run and
+  written by a background thread in a single transaction per batch
+- Indexes on status, creation time and config hash keep run listings and
+  "has this config been run before?" lookups fast with thousands of runs
+- Schema version tracked with PRAGMA user_version for future migrations
+
+Rows are returned as dicts shaped like the Run / ChatMessage interfaces in
+shared/schema.ts (optional fields are omitted rather than null).
 
 Example Interface:
     storage = Storage(db_path="trex.db")
-    
+
     # Run operations
     run_id = storage.create_run(config)
     storage.update_run_status(run_id, "running")
     storage.update_run_metrics(run_id, {"val_loss": 0.234})
     run = storage.get_run(run_id)
     runs = storage.list_runs(status="completed")
-    
+
     # Message operations
     storage.add_message(message)
     messages = storage.get_messages(limit=50)
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 1
+
+RUN_STATUSES = ("pending", "running", "completed", "failed")
+
+# Metrics promoted to their own columns (everything else stays in the JSON blob)
+METRIC_COLUMNS = ("val_loss", "accuracy", "lr_used")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    config TEXT NOT NULL,
+    config_hash TEXT NOT NULL,
+    command TEXT,
+    hyperparameters TEXT,
+    metrics TEXT NOT NULL DEFAULT '{}',
+    val_loss REAL,
+    accuracy REAL,
+    lr_used REAL,
+    stdout TEXT,
+    stderr TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_status ON runs (status, created_at);
+CREATE INDEX IF NOT EXISTS idx_runs_created_at ON runs (created_at);
+CREATE INDEX IF NOT EXISTS idx_runs_config_hash ON runs (config_hash);
 
-This file is intentionally left incomplete for backend teammates to implement.
+CREATE TABLE IF NOT EXISTS messages (
+    id TEXT PRIMARY KEY,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    extra TEXT NOT NULL DEFAULT '{}',
+    seq INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_seq ON messages (seq);
 """
 
-# TODO: Implement Storage class
-# TODO: Choose and set up database (SQLite/PostgreSQL)
-# TODO: Define database schema
-# TODO: Implement CRUD operations
-# TODO: Add query methods with filtering
-# TODO: Optional: Add migrations
+# Columns returned by list_runs unless include_logs=True
+_SUMMARY_COLUMNS = (
+    "id, status, config, command, hyperparameters, metrics, val_loss, accuracy, "
+    "lr_used, error, created_at, updated_at"
+)
+
+
+def config_hash(config: dict) -> str:
+    """Stable hash of a run config (key order does not matter)."""
+    payload = json.dumps(config, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _iso(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+class Storage:
+    """
+    Args:
+        db_path: SQLite database file (":memory:" is not supported, since
+            readers and the writer use separate connections)
+        flush_interval: Seconds the metric writer waits to collect a batch
+        max_batch: Flush early once this many runs have pending metrics
+    """
+
+    def __init__(self, db_path: str = "trex.db", flush_interval: float = 0.2, max_batch: int = 500):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+
+        self._write_lock = threading.Lock()
+        self._writer = self._connect()
+        self._migrate()
+        self._readers = threading.local()
+
+        self._pending = {}  # run_id -> merged metrics waiting for the next batch
+        self._pending_lock = threading.Condition()
+        self._flushing = False  # a taken batch is being committed
+        self._closed = False
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True, name="storage-flush")
+        self._flusher.start()
+
+    # ------------------------------------------------------------------
+    # Connections
+    # ------------------------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        # isolation_level=None: transactions are opened explicitly with BEGIN
+        conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._readers, "conn", None)
+        if conn is None:
+            conn = self._readers.conn = self._connect()
+        return conn
+
+    def _migrate(self):
+        with self._write_lock:
+            version = self._writer.execute("PRAGMA user_version").fetchone()[0]
+            if version < SCHEMA_VERSION:
+                self._writer.executescript(_SCHEMA)
+                self._writer.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _transaction(self, statements):
+        """Run (sql, params) pairs in one write transaction."""
+        with self._write_lock:
+            self._writer.execute("BEGIN IMMEDIATE")
+            try:
+                for sql, params in statements:
+                    self._writer.execute(sql, params)
+            except BaseException:
+                self._writer.execute("ROLLBACK")
+                raise
+            self._writer.execute("COMMIT")
+
+    def close(self):
+        """Write pending metrics and close all connections."""
+        with self._pending_lock:
+            self._closed = True
+            self._pending_lock.notify()
+        self._flusher.join()
+        self.flush()
+        with self._write_lock:
+            self._writer.close()
+        conn = getattr(self._readers, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._readers.conn = None
+
+    # ------------------------------------------------------------------
+    # Run operations
+    # ------------------------------------------------------------------
+
+    def create_run(self, config: dict, run_id: Optional[str] = None, command: Optional[str] = None,
+                   hyperparameters: Optional[dict] = None) -> str:
+        """Insert a pending run and return its id."""
+        run_id = run_id or f"run-{uuid.uuid4().hex[:8]}"
+        now = time.time()
+        self._transaction([(
+            "INSERT INTO runs (id, status, config, config_hash, command, hyperparameters, created_at, updated_at) "
+            "VALUES (?, 'pending', ?, ?, ?, ?, ?, ?)",
+            (
+                run_id,
+                json.dumps(config),
+                config_hash(config),
+                command,
+                json.dumps(hyperparameters) if hyperparameters is not None else None,
+                now,
+                now,
+            ),
+        )])
+        return run_id
+
+    def update_run_status(self, run_id: str, status: str, error: Optional[str] = None):
+        if status not in RUN_STATUSES:
+            raise ValueError(f"Unknown run status: {status}")
+        self._transaction([(
+            "UPDATE runs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+            (status, error, time.time(), run_id),
+        )])
+
+    def update_run_output(self, run_id: str, stdout: Optional[str] = None, stderr: Optional[str] = None):
+        """Store a run's captured stdout/stderr."""
+        self._transaction([(
+            "UPDATE runs SET stdout = COALESCE(?, stdout), stderr = COALESCE(?, stderr), updated_at = ? WHERE id = ?",
+            (stdout, stderr, time.time(), run_id),
+        )])
+
+    def update_run_metrics(self, run_id: str, metrics: dict):
+        """Queue metrics for a run; they are merged into the stored metrics on the next batch."""
+        with self._pending_lock:
+            self._pending.setdefault(run_id, {}).update(metrics)
+            if len(self._pending) >= self.max_batch:
+                self._pending_lock.notify()
+
+    def flush(self):
+        """Write all queued metric updates in one transaction."""
+        # Nothing queued or being committed: return without waiting for the
+        # writer. _flushing is set before the batch is taken, so a reader that
+        # sees the emptied queue also sees that the batch isn't committed yet.
+        if not self._pending and not self._flushing:
+            return
+        # The batch is taken while holding the write lock, so a reader's flush()
+        # waits for a batch the flusher thread is still committing, and batches
+        # commit in the order they were queued
+        with self._write_lock:
+            try:
+                with self._pending_lock:
+                    self._flushing = True
+                    pending, self._pending = self._pending, {}
+                if pending:
+                    self._write_batch(pending)
+            finally:
+                self._flushing = False
+
+    def _write_batch(self, pending: dict):
+        """Merge queued metric updates into the stored runs. Caller holds the write lock."""
+        now = time.time()
+        self._writer.execute("BEGIN IMMEDIATE")
+        try:
+            ids = list(pending)
+            placeholders = ",".join("?" * len(ids))
+            stored = {
+                row["id"]: json.loads(row["metrics"])
+                for row in self._writer.execute(f"SELECT id, metrics FROM runs WHERE id IN ({placeholders})", ids)
+            }
+            rows = []
+            for run_id, update in pending.items():
+                if run_id not in stored:
+                    continue
+                merged = {**stored[run_id], **update}
+                rows.append((json.dumps(merged), *(merged.get(c) for c in METRIC_COLUMNS), now, run_id))
+            self._writer.executemany(
+                "UPDATE runs SET metrics = ?, val_loss = ?, accuracy = ?, lr_used = ?, updated_at = ? WHERE id = ?",
+                rows,
+            )
+        except BaseException:
+            self._writer.execute("ROLLBACK")
+            # Put the batch back under any updates queued since
+            with self._pending_lock:
+                for run_id, update in pending.items():
+                    self._pending[run_id] = {**update, **self._pending.get(run_id, {})}
+            raise
+        self._writer.execute("COMMIT")
+
+    def _flush_loop(self):
+        while True:
+            with self._pending_lock:
+                if not self._closed and len(self._pending) < self.max_batch:
+                    self._pending_lock.wait(self.flush_interval)
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            except Exception:
+                # The batch was put back in the queue; keep going so later metrics still persist
+                logger.exception("Writing queued run metrics failed; retrying")
+                time.sleep(self.flush_interval)
+
+    def get_run(self, run_id: str) -> Optional[dict]:
+        self.flush()
+        row = self._reader().execute("SELECT * FROM runs WHERE id = ?", (run_id,)).fetchone()
+        return self._run_from_row(row) if row is not None else None
+
+    def list_runs(
+        self,
+        status: Optional[str] = None,
+        config: Optional[dict] = None,
+        since: Optional[float] = None,
+        limit: int = 100,
+        offset: int = 0,
+        include_logs: bool = False,
+    ) -> list:
+        """
+        Newest runs first, optionally filtered.
+
+        Args:
+            status: Only runs with this status
+            config: Only runs with exactly this config (uses the config hash index)
+            since: Only runs created at or after this Unix timestamp
+            include_logs: Also return stdout/stderr (skipped by default so
+                listings stay small)
+        """
+        self.flush()
+        clauses, params = [], []
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(status)
+        if config is not None:
+            clauses.append("config_hash = ?")
+            params.append(config_hash(config))
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        columns = "*" if include_logs else _SUMMARY_COLUMNS
+        rows = self._reader().execute(
+            f"SELECT {columns} FROM runs {where} ORDER BY created_at DESC LIMIT ? OFFSET ?",
+            (*params, limit, offset),
+        ).fetchall()
+        return [self._run_from_row(row) for row in rows]
+
+    def last_updated(self, run_ids) -> dict:
+        """{run_id: updated_at Unix timestamp} for the given runs (including queued metric writes)."""
+        self.flush()
+        run_ids = list(run_ids)
+        if not run_ids:
+            return {}
+        placeholders = ",".join("?" * len(run_ids))
+        rows = self._reader().execute(
+            f"SELECT id, updated_at FROM runs WHERE id IN ({placeholders})", run_ids
+        ).fetchall()
+        return {row["id"]: row["updated_at"] for row in rows}
+
+    def count_runs(self, status: Optional[str] = None) -> int:
+        if status is None:
+            return self._reader().execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+        return self._reader().execute("SELECT COUNT(*) FROM runs WHERE status = ?", (status,)).fetchone()[0]
+
+    @staticmethod
+    def _run_from_row(row: sqlite3.Row) -> dict:
+        keys = row.keys()
+        run = {
+            "id": row["id"],
+            "status": row["status"],
+            "config": json.loads(row["config"]),
+            "command": row["command"],
+            "hyperparameters": json.loads(row["hyperparameters"]) if row["hyperparameters"] else None,
+            "metrics": json.loads(row["metrics"]),
+            "val_loss": row["val_loss"],
+            "accuracy": row["accuracy"],
+            "lr_used": row["lr_used"],
+            "error": row["error"],
+            "created_at": _iso(row["created_at"]),
+            "updated_at": _iso(row["updated_at"]),
+        }
+        if "stdout" in keys:
+            run["stdout"] = row["stdout"]
+            run["stderr"] = row["stderr"]
+        return {key: value for key, value in run.items() if value is not None}
+
+    # ------------------------------------------------------------------
+    # Message operations
+    # ------------------------------------------------------------------
+
+    def add_message(self, message: dict) -> str:
+        """Store a ChatMessage dict (id/role/content/timestamp plus any extra fields)."""
+        message_id = message.get("id") or f"msg-{int(time.time() * 1000)}"
+        extra = {k: v for k, v in message.items() if k not in ("id", "role", "content", "timestamp")}
+        self._transaction([(
+            "INSERT OR REPLACE INTO messages (id, role, content, timestamp, extra, seq) "
+            "VALUES (?, ?, ?, ?, ?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM messages))",
+            (
+                message_id,
+                message["role"],
+                message["content"],
+                message.get("timestamp") or datetime.utcnow().isoformat() + "Z",
+                json.dumps(extra),
+            ),
+        )])
+        return message_id
+
+    def get_messages(self, limit: int = 50) -> list:
+        """The most recent messages, oldest first."""
+        rows = self._reader().execute(
+            "SELECT * FROM (SELECT * FROM messages ORDER BY seq DESC LIMIT ?) ORDER BY seq",
+            (limit,),
+        ).fetchall()
+        return [
+            {"id": row["id"], "role": row["role"], "content": row["content"], "timestamp": row["timestamp"],
+             **json.loads(row["extra"])}
+            for row in rows
+        ]
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for data loading, training throughput and orchestration overhead.
+
+Measures:
+- get_6_vs_7_dataset cold (fresh process) and warm load time
+- train() samples/sec across model widths, depths and batch sizes
+- train() steps/sec and first-step (compile) time per --compile mode
+- evaluate() latency on the full validation set
+- per-command overhead of runner.run_safe_command over a bare subprocess
+- end-to-end wall time of test.py with OpenAI calls served by bench/stub_openai.py
+
+Results are written as JSON; pass --baseline to compare against a stored
+run and flag regressions.
+
+Usage:
+    python bench/run.py --output bench/results.json
+    python bench/run.py --quick --baseline bench/baseline.json --fail-on-regression
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+MNIST_DIR = os.path.join(REPO_ROOT, "mnist67")
+
+sys.path.insert(0, MNIST_DIR)
+sys.path.insert(0, REPO_ROOT)
+import torch  # noqa: E402
+import train  # noqa: E402
+from runner import run_safe_command  # noqa: E402
+from stub_openai import DEFAULT_COMMANDS, start_stub_server  # noqa: E402
+
+BENCHMARKS = ("data", "train", "compile", "evaluate", "runner", "pipeline")
+
+_COLD_LOAD_SCRIPT = """
+import json, sys, time
+sys.path.insert(0, {mnist_dir!r})
+import train
+start = time.perf_counter()
+train.get_6_vs_7_dataset({dataset_size}, {val_size})
+print(json.dumps(time.perf_counter() - start))
+"""
+
+
+def result(value, unit, lower_is_better=True, **details):
+    return {"value": value, "unit": unit, "lower_is_better": lower_is_better, **details}
+
+
+def median_time(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def train_args(**overrides):
+    argv = list(itertools.chain.from_iterable((f"--{k}", str(v)) for k, v in overrides.items()))
+    return train.build_parser().parse_args(argv)
+
+
+def bench_data(quick):
+    dataset_size, val_size = 2000, 1000
+    cold = []
+    for _ in range(1 if quick else 3):
+        script = _COLD_LOAD_SCRIPT.format(mnist_dir=MNIST_DIR, dataset_size=dataset_size, val_size=val_size)
+        out = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+        cold.append(float(out.stdout.strip().splitlines()[-1]))
+    train.get_6_vs_7_dataset(dataset_size, val_size)
+    warm = median_time(lambda: train.get_6_vs_7_dataset(dataset_size, val_size), 3 if quick else 10)
+    return {
+        "data.cold_load_s": result(statistics.median(cold), "s"),
+        "data.warm_load_s": result(warm, "s"),
+    }
+
+
+def bench_train(quick):
+    widths, depths, batch_sizes = ([64, 256], [2], [64]) if quick else ([64, 256, 1024], [2, 4], [32, 128, 512])
+    # Warm-up: the first optimizer step pays one-off lazy imports inside torch
+    with contextlib.redirect_stdout(io.StringIO()):
+        train.train(train_args(dataset_size=256, epochs=1), seed=0)
+    results = {}
+    for width, depth, batch_size in itertools.product(widths, depths, batch_sizes):
+        args = train_args(model_width=width, model_depth=depth, batch_size=batch_size,
+                          dataset_size=4000, epochs=2 if quick else 3)
+        with contextlib.redirect_stdout(io.StringIO()):
+            metrics = train.train(args, seed=0)
+        epochs_run = metrics["stopped_epoch"] or metrics["epochs"]
+        # Excludes dataset construction, which bench_data measures separately
+        seconds = metrics["total_time"] - metrics["data_time"]
+        results[f"train.samples_per_s.w{width}_d{depth}_b{batch_size}"] = result(
+            metrics["train_size"] * epochs_run / seconds, "samples/s", lower_is_better=False,
+        )
+    return results
+
+
+def bench_compile(quick):
+    results = {}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for width in ([64] if quick else [64, 512]):
+            for mode in train.COMPILE_MODES:
+                args = train_args(model_width=width, dataset_size=4000, epochs=2, compile=mode,
+                                  compile_cache_dir=cache_dir)
+                with contextlib.redirect_stdout(io.StringIO()), train.inductor_cache(cache_dir):
+                    metrics = train.train(args, seed=0)
+                results[f"compile.steps_per_s.{mode}.w{width}"] = result(
+                    metrics["steps_per_sec"], "steps/s", lower_is_better=False,
+                )
+                results[f"compile.first_step_s.{mode}.w{width}"] = result(metrics["first_step_time"], "s")
+    return results
+
+
+def bench_evaluate(quick):
+    args = train_args(dataset_size=100, val_size=1000)
+    _, _, val_x, val_y = train.prepare_data(args, torch.device("cpu"))
+    criterion = torch.nn.CrossEntropyLoss()
+    results = {}
+    for width, depth in ([(64, 2)] if quick else [(64, 2), (256, 4), (1024, 4)]):
+        model = train.SimpleMLP(width=width, depth=depth)
+        train.evaluate(model, val_x, val_y, criterion)  # warm-up
+        latency = median_time(lambda: train.evaluate(model, val_x, val_y, criterion), 10 if quick else 50)
+        results[f"evaluate.latency_ms.w{width}_d{depth}"] = result(latency * 1000, "ms")
+    return results
+
+
+def bench_runner(quick):
+    repeats = 5 if quick else 20
+    with tempfile.TemporaryDirectory() as tmp:
+        # run_safe_command only accepts "python ...train.py" commands
+        script = os.path.join(tmp, "train.py")
+        with open(script, "w") as f:
+            f.write("print('Final Validation Loss: 0.5')\n")
+        command = f"python {script}"
+        bare, wrapped = [], []
+        # Interleave the two so machine noise hits both equally
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(repeats):
+                bare.append(median_time(lambda: subprocess.run(["python", script], capture_output=True), 1))
+                wrapped.append(median_time(lambda: run_safe_command(command), 1))
+    bare, wrapped = statistics.median(bare), statistics.median(wrapped)
+    return {
+        "runner.bare_subprocess_ms": result(bare * 1000, "ms"),
+        "runner.run_safe_command_ms": result(wrapped * 1000, "ms"),
+        # A difference can be near zero or negative, so it is reported but not ratio-compared
+        "runner.overhead_ms": result((wrapped - bare) * 1000, "ms", compare=False),
+    }
+
+
+def bench_pipeline(quick, llm_latency):
+    commands = DEFAULT_COMMANDS[:2] if quick else DEFAULT_COMMANDS
+    server, base_url = start_stub_server(commands, latency=llm_latency)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            # test.py resolves mnist67/train.py and its caches relative to the working directory
+            os.symlink(MNIST_DIR, os.path.join(tmp, "mnist67"))
+            env = {**os.environ, "OPENAI_BASE_URL": base_url, "OPENAI_API_KEY": "stub"}
+            start = time.perf_counter()
+            subprocess.run(
+                [sys.executable, os.path.join(REPO_ROOT, "test.py"), "--request", "scaling law over dataset size",
+                 "--no-run-cache", "--no-llm-cache"],
+                cwd=tmp, env=env, capture_output=True, check=True,
+            )
+            wall = time.perf_counter() - start
+    finally:
+        server.shutdown()
+    return {"pipeline.test_py_wall_s": result(wall, "s", commands=len(commands), llm_latency_s=llm_latency)}
+
+
+def metadata():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "torch_threads": torch.get_num_threads(),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Print a comparison table; return the names of metrics that regressed beyond tolerance."""
+    regressions = []
+    print(f"\n{'metric':<45} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, current in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not current.get("compare", True):
+            continue
+        if base is None or not base["value"]:
+            print(f"{name:<45} {'-':>12} {current['value']:>12.4g} {'new':>8}")
+            continue
+        change = current["value"] / base["value"] - 1
+        worse = change > tolerance if current["lower_is_better"] else change < -tolerance
+        if worse:
+            regressions.append(name)
+        flag = "  REGRESSION" if worse else ""
+        print(f"{name:<45} {base['value']:>12.4g} {current['value']:>12.4g} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default=os.path.join(BENCH_DIR, "results.json"))
+    parser.add_argument("--only", default=",".join(BENCHMARKS), help=f"Comma-separated subset of {BENCHMARKS}")
+    parser.add_argument("--quick", action="store_true", help="Smaller grids and fewer repeats")
+    parser.add_argument("--llm-latency", type=float, default=0.0,
+                        help="Seconds the stub OpenAI server waits per call in the pipeline benchmark")
+    parser.add_argument("--baseline", default=None, help="Earlier results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Relative change counted as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    selected = [name.strip() for name in args.only.split(",") if name.strip()]
+    results = {}
+    for name in selected:
+        print(f"Running {name} benchmarks...", flush=True)
+        if name == "pipeline":
+            results.update(bench_pipeline(args.quick, args.llm_latency))
+        else:
+            results.update(globals()[f"bench_{name}"](args.quick))
+
+    report = {"meta": {**metadata(), "quick": args.quick}, "results": results}
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    for name, entry in results.items():
+        print(f"  {name:<45} {entry['value']:>12.4g} {entry['unit']}")
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
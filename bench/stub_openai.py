@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the OpenAI chat completions API.
+
+Answers every POST /v1/chat/completions with a canned JSON plan of training
+commands, so the test.py pipeline can be timed end to end without network
+access or API cost. Point the OpenAI client at it with
+OPENAI_BASE_URL=http://127.0.0.1:<port>/v1.
+
+Usage:
+    python bench/stub_openai.py --port 8765 --latency 0.5
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_COMMANDS = [
+    f"python mnist67/train.py --dataset_size {size} --epochs 1 --seed {seed}"
+    for size in (250, 500, 1000)
+    for seed in (0, 1)
+]
+
+
+def make_handler(commands, latency):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            time.sleep(latency)
+            payload = json.dumps({
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "stub"),
+                "choices": [{
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": json.dumps({"commands": commands})},
+                }],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start_stub_server(commands=None, latency=0.0, port=0):
+    """Serve in a background thread; returns (server, base_url). Call server.shutdown() when done."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(commands or DEFAULT_COMMANDS, latency))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before answering")
+    args = parser.parse_args()
+    server, url = start_stub_server(latency=args.latency, port=args.port)
+    print(f"Stub OpenAI API at {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
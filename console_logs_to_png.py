@@ -8,6 +8,10 @@ import tempfile
 import subprocess
 from openai import OpenAI
 
+from plots import match_plot_type, scaling_law_from_logs
+from llm_cache import cached_completion
+from tracing import maybe_span, token_usage
+
 
 # ============================================================================
 # DEBUG: Hardcode console logs here for testing
@@ -31,10 +35,17 @@ def plot_from_logs(
     plotting_request: str,
     name: str = "plot",
     api_key: str = None,
-    model: str = "gpt-4o"
+    model: str = "gpt-4o",
+    use_builtin: bool = True,
+    llm_cache=None,
+    bypass_llm_cache: bool = False,
+    tracer=None
 ) -> str:
     """
-    Generate a plot from console logs using ChatGPT.
+    Generate a plot from console logs.
+
+    Known plot types (currently log-log scaling laws) are fitted and rendered
+    locally by plots.py; anything else is sent to ChatGPT.
     
     Args:
         console_logs: Raw console log text
@@ -42,6 +53,10 @@ def plot_from_logs(
         name: Name for the output file (without extension, will be saved as gpt_png/{name}.png)
         api_key: OpenAI API key (if None, uses OPENAI_API_KEY env var)
         model: OpenAI model to use (default: gpt-4o)
+        use_builtin: Use the built-in plotter when the request matches a known plot type
+        llm_cache: Optional llm_cache.LLMCache for the ChatGPT call
+        bypass_llm_cache: Skip the cache lookup but still store the fresh response
+        tracer: Optional tracing.Tracer; the ChatGPT call is recorded as an "llm_plot" span
     
     Returns:
         Path to the saved PNG file (gpt_png/{name}.png)
@@ -52,6 +67,19 @@ def plot_from_logs(
     
     # Create output path
     output_path = os.path.join(output_dir, f"{name}.png")
+
+    if use_builtin and match_plot_type(plotting_request) == "scaling_law":
+        fits = scaling_law_from_logs(
+            console_logs,
+            output_path,
+            irreducible="irreducible" in plotting_request.lower(),
+        )
+        if fits is not None:
+            for label, fit in fits.items():
+                print(f"Fit{'' if label is None else f' ({label})'}: L = {fit['a']:.4g} * N^{fit['b']:.4f} + {fit['c']:.4g}")
+            print(f"✓ Plot saved to {output_path}")
+            return output_path
+        print("Could not parse scaling-law data from the logs, falling back to ChatGPT")
     
     # Call the main function
     return generate_plot_with_chatgpt(
@@ -59,7 +87,10 @@ def plot_from_logs(
         output_path=output_path,
         prompt=plotting_request,
         api_key=api_key,
-        model=model
+        model=model,
+        llm_cache=llm_cache,
+        bypass_llm_cache=bypass_llm_cache,
+        tracer=tracer
     )
 
 
@@ -68,7 +99,10 @@ def generate_plot_with_chatgpt(
     output_path: str = "scaling_law_plot.png",
     prompt: str = "Given this data can you plot me a log log scaling law for validation loss with line of best fit",
     api_key: str = None,
-    model: str = "gpt-4o"
+    model: str = "gpt-4o",
+    llm_cache=None,
+    bypass_llm_cache: bool = False,
+    tracer=None
 ) -> str:
     """
     Send console logs to ChatGPT, get plotting code, execute it, and save PNG.
@@ -79,6 +113,10 @@ def generate_plot_with_chatgpt(
         prompt: Custom prompt for ChatGPT
         api_key: OpenAI API key (if None, uses OPENAI_API_KEY env var)
         model: OpenAI model to use (default: gpt-4o)
+        llm_cache: Optional llm_cache.LLMCache for the ChatGPT call; a response
+            whose code fails to produce the plot is removed from it again
+        bypass_llm_cache: Skip the cache lookup but still store the fresh response
+        tracer: Optional tracing.Tracer; the ChatGPT call is recorded as an "llm_plot" span
     
     Returns:
         Path to the saved PNG file
@@ -105,7 +143,7 @@ Please generate Python code using matplotlib to create the plot. The code should
 
 Return ONLY the Python code, wrapped in ```python code blocks."""
     
-    response = client.chat.completions.create(
+    request = dict(
         model=model,
         messages=[
             {
@@ -119,7 +157,23 @@ Return ONLY the Python code, wrapped in ```python code blocks."""
         ],
         temperature=0.3,
     )
+    with maybe_span(tracer, "llm_plot", model=model) as span:
+        hits = llm_cache.hits if llm_cache is not None else 0
+        response = cached_completion(client, llm_cache, bypass=bypass_llm_cache, **request)
+        cached = llm_cache is not None and llm_cache.hits > hits
+        span.set(cached=cached, **({} if cached else token_usage(response)))
     
+    try:
+        return _run_plot_code(response, output_path)
+    except Exception:
+        # Don't replay a broken answer from the cache; the next run asks again
+        if llm_cache is not None:
+            llm_cache.delete(llm_cache.key_for(**request))
+        raise
+
+
+def _run_plot_code(response, output_path: str) -> str:
+    """Extract the plotting code from a ChatGPT response, run it and return output_path."""
     response_text = response.choices[0].message.content
     print("Received response from ChatGPT")
     
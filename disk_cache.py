@@ -0,0 +1,79 @@
+# disk_cache.py
+"""
+Small JSON-file cache on local disk with size-based LRU eviction.
+
+Shared by run_cache.RunCache (training results) and llm_cache.LLMCache
+(model responses). Each entry is one JSON file, sharded by the first two
+characters of its key; reading an entry bumps its mtime so eviction removes
+the least recently used files first.
+"""
+import json
+import os
+import threading
+
+
+class DiskCache:
+    """
+    Args:
+        cache_dir: Directory holding one JSON file per entry
+        max_bytes: Evict least recently used entries beyond this total size
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + ".json")
+
+    def read(self, key: str):
+        """Return the stored entry for key, or None."""
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+            os.utime(path)  # mark as recently used
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        return entry
+
+    def write(self, key: str, entry: dict):
+        """Atomically store an entry and evict old ones if needed."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def delete(self, key: str):
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        with self._lock:
+            entries = []
+            total = 0
+            for shard in os.scandir(self.cache_dir):
+                if not shard.is_dir():
+                    continue
+                for entry in os.scandir(shard.path):
+                    if entry.name.endswith(".json"):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+                        total += stat.st_size
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
@@ -0,0 +1,135 @@
+# llm_cache.py
+"""
+Disk-backed cache for chat completion responses.
+
+Planning and structuring calls send the same training script and user
+request over and over; identical requests (same model, messages,
+response_format and other create() arguments) are answered from local disk
+instead of waiting on the API again. Entries expire after a TTL and are
+evicted least recently used first beyond max_bytes. Hit/miss counters and the
+API latency saved by hits are kept on the cache object.
+
+Example:
+    cache = LLMCache()
+    plan = cached_completion(client, cache, model="gpt-5", messages=[...])
+    plan = await acached_completion(async_client, cache, model="gpt-5", messages=[...])
+    print(cache.summary())
+"""
+import asyncio
+import contextlib
+import hashlib
+import json
+import threading
+import time
+
+from disk_cache import DiskCache
+
+
+class LLMCache(DiskCache):
+    """
+    Args:
+        cache_dir: Directory holding one JSON file per cached response
+        ttl: Seconds a response stays valid (None keeps entries until evicted)
+        max_bytes: Evict least recently used entries beyond this total size
+    """
+
+    def __init__(self, cache_dir: str = ".llm_cache", ttl: float = 7 * 24 * 3600, max_bytes: int = 256 * 1024 * 1024):
+        super().__init__(cache_dir, max_bytes)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self._stats_lock = threading.Lock()
+
+    @staticmethod
+    def key_for(**request) -> str:
+        """Hash every create() argument (model, messages, response_format, ...)."""
+        payload = json.dumps(request, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key: str):
+        """Return the cached response dict for key, or None on a miss."""
+        entry = self.read(key)
+        if entry is not None and self.ttl is not None and time.time() - entry["created"] > self.ttl:
+            self.delete(key)
+            entry = None
+        with self._stats_lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.saved_seconds += entry["latency"]
+        return entry["response"]
+
+    def put(self, key: str, response: dict, latency: float):
+        """Store a response together with the API latency it took."""
+        self.write(key, {"created": time.time(), "latency": latency, "response": response})
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {"hits": self.hits, "misses": self.misses, "saved_seconds": self.saved_seconds}
+
+    def summary(self) -> str:
+        stats = self.stats()
+        return f"LLM cache: {stats['hits']} hits, {stats['misses']} misses, ~{stats['saved_seconds']:.1f}s of API time saved"
+
+
+def cached_completion(client, cache: LLMCache = None, bypass: bool = False, **request):
+    """
+    client.chat.completions.create(**request), answered from cache when possible.
+
+    Args:
+        client: OpenAI client
+        cache: LLMCache to use (None disables caching)
+        bypass: Skip the cache lookup but still store the fresh response
+        **request: Arguments for chat.completions.create
+
+    Returns:
+        ChatCompletion (rebuilt from disk on a hit)
+    """
+    if cache is None:
+        return client.chat.completions.create(**request)
+
+    from openai.types.chat import ChatCompletion
+
+    key = cache.key_for(**request)
+    if not bypass:
+        cached = cache.get(key)
+        if cached is not None:
+            return ChatCompletion.model_validate(cached)
+
+    start = time.perf_counter()
+    response = client.chat.completions.create(**request)
+    cache.put(key, response.model_dump(), time.perf_counter() - start)
+    return response
+
+
+async def acached_completion(client, cache: LLMCache = None, bypass: bool = False, limiter=None, **request):
+    """
+    Async variant of cached_completion for an AsyncOpenAI client.
+
+    Disk reads/writes run in a worker thread so the event loop never blocks.
+
+    Args:
+        limiter: Optional async context manager (e.g. asyncio.Semaphore) held
+            only around the API call, so cache hits never wait for a slot
+    """
+    limiter = limiter or contextlib.nullcontext()
+    if cache is None:
+        async with limiter:
+            return await client.chat.completions.create(**request)
+
+    from openai.types.chat import ChatCompletion
+
+    key = cache.key_for(**request)
+    if not bypass:
+        cached = await asyncio.to_thread(cache.get, key)
+        if cached is not None:
+            return ChatCompletion.model_validate(cached)
+
+    async with limiter:
+        start = time.perf_counter()
+        response = await client.chat.completions.create(**request)
+        latency = time.perf_counter() - start
+    await asyncio.to_thread(cache.put, key, response.model_dump(), latency)
+    return response
@@ -1,10 +1,23 @@
 #!/usr/bin/env python3
 import argparse
+import contextlib
+import copy
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+import warnings
+import numpy as np
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 import torch.optim as optim
-from torch.utils.data import DataLoader, Subset
-from torchvision import datasets, transforms
+from torch.func import functional_call, stack_module_state, vmap
+from torch.utils.data import Dataset, Subset
+
+import data_cache
 
 
 class SimpleMLP(nn.Module):
@@ -23,11 +36,49 @@ class SimpleMLP(nn.Module):
         return self.net(x)
 
 
+class CachedMNIST67(Dataset):
+    """MNIST 6/7 images served from the memory-mapped uint8 cache."""
+
+    def __init__(self, images, labels):
+        self.images = images
+        self.labels = labels
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getitem__(self, index):
+        # Same scaling as transforms.ToTensor(): uint8 HxW -> float 1xHxW in [0, 1]
+        image = torch.from_numpy(np.array(self.images[index])).float().div(255).unsqueeze(0)
+        return image, int(self.labels[index])
+
+
+_SOURCE_CACHE = {}
+
+
+def load_6_vs_7_source():
+    """Return (dataset, indices of all 6s and 7s), loaded once per process.
+
+    Uses the memory-mapped cache from data_cache.py when it has been built and
+    falls back to torchvision's MNIST otherwise.
+    """
+    if "source" not in _SOURCE_CACHE:
+        cache = data_cache.load_cache()
+        if cache is not None:
+            images, labels = cache
+            dataset = CachedMNIST67(images, labels)
+            all_indices = torch.arange(len(labels))
+        else:
+            from torchvision import datasets, transforms
+            dataset = datasets.MNIST(root="./data", train=True, download=True, transform=transforms.ToTensor())
+            targets = dataset.targets
+            all_indices = torch.nonzero((targets == 6) | (targets == 7), as_tuple=False).squeeze()
+        _SOURCE_CACHE["source"] = (dataset, all_indices)
+    return _SOURCE_CACHE["source"]
+
+
 def get_6_vs_7_dataset(dataset_size, val_size=1000):
     """Get 6 vs 7 dataset with fixed-size validation set."""
-    mnist_full = datasets.MNIST(root="./data", train=True, download=True, transform=transforms.ToTensor())
-    targets = mnist_full.targets
-    all_indices = torch.nonzero((targets == 6) | (targets == 7), as_tuple=False).squeeze()
+    mnist_full, all_indices = load_6_vs_7_source()
     
     # Extract fixed validation set (same across all dataset_size values)
     torch.manual_seed(42)
@@ -44,28 +95,298 @@ def get_6_vs_7_dataset(dataset_size, val_size=1000):
     return Subset(mnist_full, train_indices), Subset(mnist_full, val_indices)
 
 
-def evaluate(model, val_loader, criterion, device):
-    """Evaluate model on validation set."""
+def to_tensors(subset):
+    """Materialize a 6-vs-7 Subset as (flattened float images, binary labels)."""
+    dataset, indices = subset.dataset, subset.indices
+    if isinstance(dataset, CachedMNIST67):
+        index_array = indices.numpy()
+        images = torch.from_numpy(dataset.images[index_array])
+        labels = torch.from_numpy(dataset.labels[index_array].astype(np.int64))
+    else:
+        # torchvision MNIST keeps the raw uint8 images in .data
+        images = dataset.data[indices]
+        labels = dataset.targets[indices]
+    images = images.reshape(len(indices), -1).float().div(255)
+    return images, (labels == 7).long()
+
+
+PRECISIONS = ("fp32", "bf16")
+
+
+def resolve_precision(precision):
+    """Return the precision to use: bf16 falls back to fp32 on CPUs without native bf16 support."""
+    if precision == "bf16" and not torch.ops.mkldnn._is_mkldnn_bf16_supported():
+        print("bf16 is not supported on this CPU; training in fp32", file=sys.stderr)
+        return "fp32"
+    return precision
+
+
+def autocast(precision):
+    """CPU autocast context for a precision ("fp32" disables it)."""
+    if precision == "bf16":
+        return torch.autocast("cpu", dtype=torch.bfloat16)
+    return contextlib.nullcontext()
+
+
+def configure_threads(intra_op_threads=None, inter_op_threads=None):
+    """Set torch's intra-op (per-kernel) and inter-op thread pools."""
+    if intra_op_threads:
+        torch.set_num_threads(intra_op_threads)
+    if inter_op_threads:
+        try:
+            torch.set_num_interop_threads(inter_op_threads)
+        except RuntimeError:
+            # Only allowed before the pool starts, e.g. not in a fork of a process that already used it
+            print("inter-op threads are already initialized; ignoring --inter_op_threads", file=sys.stderr)
+
+
+def evaluate(model, images, labels, criterion, precision="fp32"):
+    """Evaluate model on the full validation set in a single forward pass."""
     model.eval()
-    total_loss, correct, total = 0.0, 0, 0
-    with torch.no_grad():
-        for images, labels in val_loader:
-            images = images.view(images.size(0), -1).to(device)
-            labels = (labels == 7).long().to(device)
-            outputs = model(images)
-            loss = criterion(outputs, labels)
-            total_loss += loss.item() * images.size(0)
-            correct += (outputs.argmax(dim=1) == labels).sum().item()
-            total += labels.size(0)
+    with torch.inference_mode(), autocast(precision):
+        outputs = model(images)
+        loss = criterion(outputs.float(), labels)
+        correct = (outputs.argmax(dim=1) == labels).sum()
+        # One host sync for both numbers
+        val_loss, correct = torch.stack([loss, correct.to(loss.dtype)]).tolist()
     model.train()
-    return total_loss / total, correct / total * 100.0
+    return val_loss, correct / len(labels) * 100.0
+
+
+def prepare_data(args, device):
+    """Build the 6-vs-7 split and return it as device tensors."""
+    val_size = getattr(args, 'val_size', 1000)
+    train_dataset, val_dataset = get_6_vs_7_dataset(args.dataset_size, val_size)
+    train_x, train_y = (t.to(device) for t in to_tensors(train_dataset))
+    val_x, val_y = (t.to(device) for t in to_tensors(val_dataset))
+    return train_x, train_y, val_x, val_y
+
+
+class EarlyStopping:
+    """Track validation loss and signal when it has stopped improving."""
+
+    def __init__(self, patience=None, min_delta=0.0):
+        self.patience = patience
+        self.min_delta = min_delta
+        self.best = float("inf")
+        self.bad_evals = 0
+
+    @property
+    def enabled(self):
+        return self.patience is not None
+
+    def step(self, val_loss):
+        """Record one evaluation; return True when training should stop."""
+        if val_loss < self.best - self.min_delta:
+            self.best = val_loss
+            self.bad_evals = 0
+        else:
+            self.bad_evals += 1
+        return self.enabled and self.bad_evals >= self.patience
+
+
+class MetricsWriter:
+    """Append JSON-lines metric events to a sidecar file (no-op without a path)."""
+
+    def __init__(self, path=None):
+        self.file = open(path, "a") if path else None
+
+    @property
+    def enabled(self):
+        return self.file is not None
+
+    def write(self, event, **fields):
+        if self.file is None:
+            return
+        self.file.write(json.dumps({"event": event, **fields}) + "\n")
+        self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def eval_schedule(args, val_x, val_y, writer):
+    """Return (early stopper, whether to evaluate after an epoch, in-training val tensors)."""
+    stopper = EarlyStopping(getattr(args, "patience", None), getattr(args, "min_delta", 0.0))
+    eval_every = getattr(args, "eval_every", 1)
+    subsample = getattr(args, "eval_subsample", None)
+
+    def should_eval(epoch):
+        # Includes the last epoch, so a checkpoint's stopper state matches a longer run's at that epoch
+        wanted = stopper.enabled or writer.enabled
+        return wanted and epoch % eval_every == 0
+
+    # The validation indices are already a random permutation, so a prefix is a fixed random subsample
+    if subsample:
+        val_x, val_y = val_x[:subsample], val_y[:subsample]
+    return stopper, should_eval, val_x, val_y
+
+
+COMPILE_MODES = ("none", "script", "inductor")
+DEFAULT_COMPILE_CACHE = os.path.join(data_cache.CACHE_DIR, "compile")
+
+
+@contextlib.contextmanager
+def inductor_cache(cache_dir):
+    """Point Inductor's on-disk kernel cache at cache_dir/inductor for the with-block.
+
+    Inductor reads TORCHINDUCTOR_CACHE_DIR whenever it compiles (which
+    happens lazily, also for new batch shapes mid-training), so the variable
+    is set around a whole training run and restored afterwards.
+    """
+    previous = os.environ.get("TORCHINDUCTOR_CACHE_DIR")
+    os.environ["TORCHINDUCTOR_CACHE_DIR"] = os.path.join(cache_dir, "inductor")
+    try:
+        yield
+    finally:
+        if previous is None:
+            os.environ.pop("TORCHINDUCTOR_CACHE_DIR", None)
+        else:
+            os.environ["TORCHINDUCTOR_CACHE_DIR"] = previous
+
+
+def compile_model(model, mode, cache_dir, batch_size):
+    """Return the module to run training steps with; it shares its parameters with model.
+
+    "script" uses a TorchScript version of the model, cached under a
+    directory keyed by width, depth and batch size; "inductor" wraps the
+    model with torch.compile, whose kernels are kept in Inductor's own
+    content-addressed cache (see inductor_cache). Evaluation keeps using the
+    eager model, since TorchScript graphs cannot run under inference_mode.
+    """
+    if mode == "none":
+        return model
+    if mode == "script":
+        width, depth = model.net[0].out_features, len(model.net) // 2
+        key_dir = os.path.join(cache_dir, mode, f"w{width}_d{depth}_b{batch_size}")
+        os.makedirs(key_dir, exist_ok=True)
+        path = os.path.join(key_dir, "model.pt")
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", FutureWarning)  # torch.jit deprecation notice
+            if os.path.exists(path):
+                scripted = torch.jit.load(path)
+            else:
+                scripted = torch.jit.script(model)
+                tmp_path = f"{path}.tmp-{os.getpid()}"
+                torch.jit.save(scripted, tmp_path)
+                os.replace(tmp_path, path)
+        # A loaded module has its own weights; point it at the eager model's
+        for name, param in model.named_parameters():
+            *parents, attr = name.split(".")
+            module = scripted
+            for part in parents:
+                module = getattr(module, part)
+            setattr(module, attr, param)
+        return scripted
+    return torch.compile(model, backend="inductor", dynamic=False)
+
+
+# Flags that change the state saved after a given epoch: the weights, and the
+# early-stopping state (best loss, bad evaluations, whether the run stopped)
+# that a resumed run continues from. Everything else (--epochs, logging) may
+# differ between runs sharing checkpoints.
+CHECKPOINT_KEY_FLAGS = (
+    "learning_rate", "batch_size", "model_width", "model_depth", "dataset_size", "val_size", "precision",
+    "patience", "min_delta", "eval_every", "eval_subsample",
+)
+CHECKPOINT_FORMAT = 1
+_CHECKPOINT_RE = re.compile(r"^epoch-(\d+)\.pt$")
+
+
+def checkpoint_dir_for(args, seed):
+    """Content-addressed checkpoint directory for this training config and seed."""
+    config = {name: getattr(args, name, None) for name in CHECKPOINT_KEY_FLAGS}
+    config.update(seed=seed, format=CHECKPOINT_FORMAT)
+    digest = hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:16]
+    return os.path.join(args.checkpoint_dir, digest)
+
+
+def save_checkpoint(directory, epoch, state):
+    """Write epoch-NNNN.pt atomically (a killed run never leaves a partial file)."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"epoch-{epoch:04d}.pt")
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    torch.save(state, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def load_latest_checkpoint(directory, max_epoch):
+    """Load the newest checkpoint at or before max_epoch, or return None."""
+    if not os.path.isdir(directory):
+        return None
+    epochs = [int(m.group(1)) for m in map(_CHECKPOINT_RE.match, os.listdir(directory)) if m]
+    epochs = [e for e in epochs if e <= max_epoch]
+    if not epochs:
+        return None
+    return torch.load(os.path.join(directory, f"epoch-{max(epochs):04d}.pt"), weights_only=True)
+
+
+PROFILE_PHASES = ("data", "setup", "batch", "forward", "backward", "optimizer", "eval", "checkpoint")
+
+
+class PhaseTimer:
+    """Accumulate wall time per training phase for --profile (a no-op when disabled).
+
+    With record=True every phase is also a torch.profiler.record_function
+    range, so it shows up by name in an exported trace.
+    """
+
+    _disabled = contextlib.nullcontext()
+
+    def __init__(self, enabled=False, record=False):
+        self.enabled = enabled
+        self.record = record
+        self.totals = {}
+        self.epoch_samples_per_sec = []
+
+    def phase(self, name):
+        return self._timed(name) if self.enabled else self._disabled
+
+    @contextlib.contextmanager
+    def _timed(self, name):
+        with torch.profiler.record_function(name) if self.record else self._disabled:
+            start = time.perf_counter()
+            try:
+                yield
+            finally:
+                self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        self.totals[name] = self.totals.get(name, 0.0) + seconds
+
+    def summary(self, total_time):
+        """Seconds per phase (plus untimed "other"), the slowest phase and per-epoch samples/sec."""
+        phases = {name: self.totals[name] for name in PROFILE_PHASES if name in self.totals}
+        phases["other"] = max(0.0, total_time - sum(phases.values()))
+        return {
+            "phases": phases,
+            "slowest_phase": max(phases, key=phases.get),
+            "epoch_samples_per_sec": self.epoch_samples_per_sec,
+        }
+
+
+def format_profile(profile, total_time):
+    parts = [f"{name} {seconds:.2f}s ({seconds / total_time:.0%})" for name, seconds in profile["phases"].items()]
+    return "Profile: " + ", ".join(parts)
+
+
+def report_stop(stopped_epoch, epochs):
+    if stopped_epoch < epochs:
+        print(f"Early stopping at epoch {stopped_epoch}/{epochs}")
 
 
 def train(args, seed=None):
     """Train model and return metrics."""
+    start_time = time.perf_counter()
+    writer = MetricsWriter(getattr(args, "metrics_file", None))
     device = torch.device("cpu")
-    val_size = getattr(args, 'val_size', 1000)
-    train_dataset, val_dataset = get_6_vs_7_dataset(args.dataset_size, val_size)
+    train_x, train_y, val_x, val_y = prepare_data(args, device)
+    data_time = time.perf_counter() - start_time
+    trace_path = getattr(args, "profile_trace", None)
+    timer = PhaseTimer(getattr(args, "profile", False) or bool(trace_path), record=bool(trace_path))
+    timer.add("data", data_time)
     
     if seed is not None:
         torch.manual_seed(seed)
@@ -73,45 +394,304 @@ def train(args, seed=None):
     else:
         generator = None
     
-    train_loader = DataLoader(train_dataset, batch_size=args.batch_size, shuffle=True, num_workers=0, generator=generator)
-    val_loader = DataLoader(val_dataset, batch_size=args.batch_size, shuffle=False, num_workers=0)
-    
+    setup_start = time.perf_counter()
+    precision = resolve_precision(getattr(args, "precision", "fp32"))
     model = SimpleMLP(width=args.model_width, depth=args.model_depth).to(device)
+    compile_mode = getattr(args, "compile", "none")
+    forward_model = compile_model(
+        model, compile_mode, getattr(args, "compile_cache_dir", DEFAULT_COMPILE_CACHE), args.batch_size,
+    )
     optimizer = optim.Adam(model.parameters(), lr=args.learning_rate)
     criterion = nn.CrossEntropyLoss()
     
+    stopper, should_eval, eval_x, eval_y = eval_schedule(args, val_x, val_y, writer)
+    stopped_epoch = args.epochs
+    
+    num_train = len(train_y)
+    steps, first_step_time = 0, 0.0
+    total_loss = torch.zeros(())
+    correct = torch.zeros((), dtype=torch.long)
+    checkpoint_dir = None
+    if getattr(args, "checkpoint_dir", None):
+        if seed is None:
+            # Unseeded runs differ every time; sharing one directory would resume one from another
+            print("Not checkpointing: --checkpoint_dir requires --seed")
+        else:
+            checkpoint_dir = checkpoint_dir_for(args, seed)
+    first_epoch, resumed_epoch = 1, 0
+    final_eval = None
+    if checkpoint_dir and getattr(args, "resume", False):
+        checkpoint = load_latest_checkpoint(checkpoint_dir, args.epochs)
+        if checkpoint is not None:
+            model.load_state_dict(checkpoint["model"])
+            optimizer.load_state_dict(checkpoint["optimizer"])
+            torch.set_rng_state(checkpoint["rng"])
+            if generator is not None:
+                generator.set_state(checkpoint["generator"])
+            stopper.best, stopper.bad_evals = checkpoint["stopper"]
+            total_loss, correct = checkpoint["total_loss"], checkpoint["correct"]
+            resumed_epoch = checkpoint["epoch"]
+            first_epoch = resumed_epoch + 1
+            if checkpoint["stopped"]:
+                stopped_epoch = checkpoint["epoch"]
+                first_epoch = args.epochs + 1
+            print(f"Resumed from epoch {checkpoint['epoch']}")
+    # Model, optimizer (whose first construction imports torch._dynamo) and checkpoint loading
+    timer.add("setup", time.perf_counter() - setup_start)
+    
+    profiler = None
+    if trace_path:
+        profiler = torch.profiler.profile(activities=[torch.profiler.ProfilerActivity.CPU])
+        profiler.start()
     model.train()
-    for epoch in range(args.epochs):
-        total_loss, correct, total = 0.0, 0, 0
-        for images, labels in train_loader:
-            images = images.view(images.size(0), -1).to(device)
-            labels = (labels == 7).long().to(device)
-            optimizer.zero_grad()
-            outputs = model(images)
-            loss = criterion(outputs, labels)
-            loss.backward()
-            optimizer.step()
-            total_loss += loss.item() * images.size(0)
-            correct += (outputs.argmax(dim=1) == labels).sum().item()
-            total += labels.size(0)
+    for epoch in range(first_epoch, args.epochs + 1):
+        epoch_start = time.perf_counter()
+        total_loss = torch.zeros(())
+        correct = torch.zeros((), dtype=torch.long)
+        # Shuffle by slicing a seeded index permutation instead of a DataLoader
+        with timer.phase("batch"):
+            perm = torch.randperm(num_train, generator=generator)
+        steps_before, loop_start = steps, time.perf_counter()
+        for start in range(0, num_train, args.batch_size):
+            with timer.phase("batch"):
+                batch = perm[start:start + args.batch_size]
+                images, labels = train_x[batch], train_y[batch]
+            with timer.phase("optimizer"):
+                optimizer.zero_grad()
+            with timer.phase("forward"), autocast(precision):
+                outputs = forward_model(images)
+                loss = criterion(outputs, labels)
+            with timer.phase("backward"):
+                loss.backward()
+            with timer.phase("optimizer"):
+                optimizer.step()
+            total_loss += loss.detach() * labels.size(0)
+            correct += (outputs.argmax(dim=1) == labels).sum()
+            steps += 1
+            if steps == 1:
+                # Includes compilation (or loading compiled kernels) when --compile is set
+                first_step_time = time.perf_counter() - loop_start
+        # Throughput of the latest epoch; the first one run also pays for compiling each batch shape
+        epoch_steps, loop_time = steps - steps_before, time.perf_counter() - loop_start
+        if timer.enabled:
+            epoch_metrics = {"samples_per_sec": num_train / (time.perf_counter() - loop_start)}
+            timer.epoch_samples_per_sec.append(epoch_metrics["samples_per_sec"])
+        else:
+            epoch_metrics = {}
+        if steps_before == 0:
+            epoch_steps, loop_time = epoch_steps - 1, loop_time - first_step_time
         
-        val_loss, val_acc = evaluate(model, val_loader, criterion, device)
+        if should_eval(epoch):
+            with timer.phase("eval"):
+                val_loss, val_acc = evaluate(model, eval_x, eval_y, criterion, precision)
+            epoch_metrics.update(val_loss=val_loss, val_acc=val_acc)
+        stopped = "val_loss" in epoch_metrics and stopper.step(epoch_metrics["val_loss"])
+        if stopped or epoch == args.epochs:
+            # The run's last epoch reports the full-size evaluation (reused when it just ran on the full set)
+            if "val_loss" not in epoch_metrics or eval_x is not val_x:
+                with timer.phase("eval"):
+                    val_loss, val_acc = evaluate(model, val_x, val_y, criterion, precision)
+            final_eval = val_loss, val_acc
+            epoch_metrics.update(val_loss=val_loss, val_acc=val_acc)
+        if writer.enabled:
+            writer.write(
+                "epoch",
+                seed=seed,
+                epoch=epoch,
+                train_loss=total_loss.item() / num_train,
+                train_acc=correct.item() / num_train * 100.0,
+                epoch_time=time.perf_counter() - epoch_start,
+                **epoch_metrics,
+            )
+        if checkpoint_dir:
+            with timer.phase("checkpoint"):
+                save_checkpoint(checkpoint_dir, epoch, {
+                    "epoch": epoch,
+                    "stopped": stopped,
+                    "model": model.state_dict(),
+                    "optimizer": optimizer.state_dict(),
+                    "rng": torch.get_rng_state(),
+                    "generator": generator.get_state() if generator is not None else None,
+                    "stopper": (stopper.best, stopper.bad_evals),
+                    "total_loss": total_loss,
+                    "correct": correct,
+                })
+        if stopped:
+            stopped_epoch = epoch
+            break
+    
+    if final_eval is None:
+        # No epoch ran (resumed from the --epochs checkpoint or from a run that had stopped)
+        with timer.phase("eval"):
+            final_eval = evaluate(model, val_x, val_y, criterion, precision)
+    val_loss, val_acc = final_eval
+    if profiler is not None:
+        profiler.stop()
+        profiler.export_chrome_trace(trace_path)
     
+    report_stop(stopped_epoch, args.epochs)
+    steps_per_sec = epoch_steps / loop_time if steps > 1 and epoch_steps > 0 else None
+    if compile_mode != "none" and steps_per_sec is not None:
+        print(f"Steps/sec: {steps_per_sec:.1f} (compile={compile_mode}, first step {first_step_time:.2f}s)")
+    total_time = time.perf_counter() - start_time
+    profile = timer.summary(total_time) if timer.enabled else None
+    if profile is not None:
+        print(format_profile(profile, total_time))
+    if trace_path:
+        print(f"Wrote profiler trace to {trace_path}")
     # Print only the final validation loss
     print(f"Final Validation Loss: {val_loss:.4f}")
     
-    return {
-        "train_loss": total_loss / total,
-        "train_acc": correct / total * 100.0,
+    metrics = {
+        "train_loss": total_loss.item() / num_train,
+        "train_acc": correct.item() / num_train * 100.0,
         "val_loss": val_loss,
         "val_acc": val_acc,
         "dataset_size": args.dataset_size,
-        "train_size": len(train_dataset),
-        "val_size": len(val_dataset),
+        "train_size": num_train,
+        "val_size": len(val_y),
+        "epochs": args.epochs,
+        "stopped_epoch": stopped_epoch,
+        "resumed_epoch": resumed_epoch,
+        "compile": compile_mode,
+        "precision": precision,
+        "intra_op_threads": torch.get_num_threads(),
+        "inter_op_threads": torch.get_num_interop_threads(),
+        "steps_per_sec": steps_per_sec,
+        "first_step_time": first_step_time,
+        "data_time": data_time,
+        "total_time": total_time,
     }
+    if profile is not None:
+        metrics["profile"] = profile
+    writer.write("final", seed=seed, **metrics)
+    writer.close()
+    return metrics
 
 
-if __name__ == "__main__":
+def evaluate_ensemble(ensemble_forward, params, buffers, images, labels, precision="fp32"):
+    """Evaluate every ensemble member on the full validation set in one pass."""
+    with torch.inference_mode(), autocast(precision):
+        outputs = ensemble_forward(params, buffers, images).float()  # (K, N, classes)
+        losses = F.cross_entropy(outputs.transpose(1, 2), labels.expand(outputs.size(0), -1), reduction="none").mean(dim=1)
+        correct = (outputs.argmax(dim=-1) == labels).sum(dim=1)
+        val_losses, correct = torch.stack([losses, correct.to(losses.dtype)]).tolist()
+    return val_losses, [c / len(labels) * 100.0 for c in correct]
+
+
+def train_ensemble(args, seeds):
+    """Train one SimpleMLP per seed at once and return a list of per-seed metrics.
+
+    Each member is initialized and shuffled exactly as train(args, seed) would;
+    the stacked weights are run through torch.func.vmap so all members share
+    one batched forward/backward pass per step. Early stopping, if enabled,
+    watches the mean validation loss so the ensemble stops as a group.
+    """
+    start_time = time.perf_counter()
+    writer = MetricsWriter(getattr(args, "metrics_file", None))
+    device = torch.device("cpu")
+    train_x, train_y, val_x, val_y = prepare_data(args, device)
+    data_time = time.perf_counter() - start_time
+    
+    precision = resolve_precision(getattr(args, "precision", "fp32"))
+    models, generators = [], []
+    for seed in seeds:
+        torch.manual_seed(seed)
+        models.append(SimpleMLP(width=args.model_width, depth=args.model_depth).to(device))
+        generators.append(torch.Generator().manual_seed(seed))
+    params, buffers = stack_module_state(models)
+    base_model = copy.deepcopy(models[0]).to("meta")
+    
+    def forward(p, b, x):
+        return functional_call(base_model, (p, b), (x,))
+    
+    train_forward = vmap(forward)
+    val_forward = vmap(forward, in_dims=(0, 0, None))
+    # Adam is elementwise, so one optimizer over stacked weights is K independent ones
+    optimizer = optim.Adam(params.values(), lr=args.learning_rate)
+    
+    stopper, should_eval, eval_x, eval_y = eval_schedule(args, val_x, val_y, writer)
+    stopped_epoch = args.epochs
+    
+    num_models, num_train = len(seeds), len(train_y)
+    final_eval = None
+    for epoch in range(1, args.epochs + 1):
+        epoch_start = time.perf_counter()
+        total_loss = torch.zeros(num_models)
+        correct = torch.zeros(num_models, dtype=torch.long)
+        # Every member gets its own data order
+        perms = torch.stack([torch.randperm(num_train, generator=g) for g in generators])
+        for start in range(0, num_train, args.batch_size):
+            batch = perms[:, start:start + args.batch_size]
+            images, labels = train_x[batch], train_y[batch]  # (K, B, D), (K, B)
+            optimizer.zero_grad()
+            with autocast(precision):
+                outputs = train_forward(params, buffers, images)
+                losses = F.cross_entropy(outputs.transpose(1, 2), labels, reduction="none").mean(dim=1)
+            # Members share no weights, so the summed loss yields per-member gradients
+            losses.sum().backward()
+            optimizer.step()
+            total_loss += losses.detach() * labels.size(1)
+            correct += (outputs.argmax(dim=-1) == labels).sum(dim=1)
+        
+        val_losses = None
+        if should_eval(epoch):
+            val_losses, val_accs = evaluate_ensemble(val_forward, params, buffers, eval_x, eval_y, precision)
+        stopped = bool(val_losses) and stopper.step(sum(val_losses) / num_models)
+        if stopped or epoch == args.epochs:
+            # The last epoch reports the full-size evaluation (reused when it just ran on the full set)
+            if not val_losses or eval_x is not val_x:
+                val_losses, val_accs = evaluate_ensemble(val_forward, params, buffers, val_x, val_y, precision)
+            final_eval = val_losses, val_accs
+        if writer.enabled:
+            epoch_time = time.perf_counter() - epoch_start
+            train_losses, train_correct = total_loss.tolist(), correct.tolist()
+            for i, seed in enumerate(seeds):
+                epoch_metrics = {"val_loss": val_losses[i], "val_acc": val_accs[i]} if val_losses else {}
+                writer.write(
+                    "epoch",
+                    seed=seed,
+                    epoch=epoch,
+                    train_loss=train_losses[i] / num_train,
+                    train_acc=train_correct[i] / num_train * 100.0,
+                    epoch_time=epoch_time,
+                    **epoch_metrics,
+                )
+        if stopped:
+            stopped_epoch = epoch
+            break
+    
+    if final_eval is None:
+        final_eval = evaluate_ensemble(val_forward, params, buffers, val_x, val_y, precision)
+    val_losses, val_accs = final_eval
+    
+    report_stop(stopped_epoch, args.epochs)
+    results = []
+    for i, seed in enumerate(seeds):
+        print(f"[seed {seed}] Final Validation Loss: {val_losses[i]:.4f}")
+        results.append({
+            "seed": seed,
+            "train_loss": total_loss[i].item() / num_train,
+            "train_acc": correct[i].item() / num_train * 100.0,
+            "val_loss": val_losses[i],
+            "val_acc": val_accs[i],
+            "dataset_size": args.dataset_size,
+            "train_size": num_train,
+            "val_size": len(val_y),
+            "epochs": args.epochs,
+            "stopped_epoch": stopped_epoch,
+            "precision": precision,
+            "intra_op_threads": torch.get_num_threads(),
+            "inter_op_threads": torch.get_num_interop_threads(),
+            "data_time": data_time,
+            "total_time": time.perf_counter() - start_time,
+        })
+        writer.write("final", **results[-1])
+    writer.close()
+    return results
+
+
+def build_parser():
     parser = argparse.ArgumentParser()
     parser.add_argument("--learning_rate", type=float, default=1e-3)
     parser.add_argument("--batch_size", type=int, default=64)
@@ -120,5 +700,60 @@ if __name__ == "__main__":
     parser.add_argument("--dataset_size", type=int, default=2000)
     parser.add_argument("--epochs", type=int, default=3)
     parser.add_argument("--val_size", type=int, default=1000)
-    args = parser.parse_args()
-    train(args)
+    parser.add_argument("--eval_every", type=int, default=1,
+                        help="Evaluate for early stopping every N epochs")
+    parser.add_argument("--patience", type=int, default=None,
+                        help="Stop after this many evaluations without improvement (default: never stop early)")
+    parser.add_argument("--min_delta", type=float, default=0.0,
+                        help="Minimum decrease in validation loss that counts as an improvement")
+    parser.add_argument("--eval_subsample", type=int, default=None,
+                        help="Evaluate on this many fixed validation samples during training (full val_size at the end)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--metrics_file", type=str, default=os.environ.get("MLLLM_METRICS_FILE"),
+                        help="Append per-epoch and final metrics as JSON lines to this file")
+    parser.add_argument("--num_seeds", type=int, default=1,
+                        help="Train this many independently seeded models at once (seeds: seed, seed+1, ...)")
+    parser.add_argument("--checkpoint_dir", type=str, default=None,
+                        help="Save model/optimizer/RNG state after every epoch under a directory keyed by the config")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue from the latest checkpoint at or before --epochs (requires --checkpoint_dir)")
+    parser.add_argument("--compile", choices=COMPILE_MODES, default="none",
+                        help="Run training steps eagerly, as TorchScript, or through torch.compile's inductor backend")
+    parser.add_argument("--compile_cache_dir", type=str, default=DEFAULT_COMPILE_CACHE,
+                        help="On-disk cache of compiled models/kernels, keyed by width, depth and batch size")
+    parser.add_argument("--precision", choices=PRECISIONS, default="fp32",
+                        help="bf16 runs forward passes under CPU autocast (falls back to fp32 without CPU support)")
+    parser.add_argument("--intra_op_threads", type=int, default=None,
+                        help="Threads used inside each op (torch.set_num_threads; default: torch's choice)")
+    parser.add_argument("--inter_op_threads", type=int, default=None,
+                        help="Threads for running independent ops in parallel (torch.set_num_interop_threads)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Time each training phase and report per-epoch samples/sec (added to the final metrics)")
+    parser.add_argument("--profile_trace", type=str, default=None,
+                        help="Also record a torch.profiler trace and write it here as Chrome trace JSON (implies --profile)")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.eval_every < 1:
+        parser.error("--eval_every must be at least 1")
+    if args.resume and not args.checkpoint_dir:
+        parser.error("--resume requires --checkpoint_dir")
+    if args.checkpoint_dir and args.num_seeds > 1:
+        parser.error("--checkpoint_dir is not supported with --num_seeds > 1")
+    if args.compile != "none" and args.num_seeds > 1:
+        parser.error("--compile is not supported with --num_seeds > 1")
+    if (args.profile or args.profile_trace) and args.num_seeds > 1:
+        parser.error("--profile is not supported with --num_seeds > 1")
+    configure_threads(args.intra_op_threads, args.inter_op_threads)
+    if args.num_seeds > 1:
+        base_seed = args.seed if args.seed is not None else 0
+        return train_ensemble(args, [base_seed + i for i in range(args.num_seeds)])
+    with inductor_cache(args.compile_cache_dir) if args.compile == "inductor" else contextlib.nullcontext():
+        return train(args, seed=args.seed)
+
+
+if __name__ == "__main__":
+    main()
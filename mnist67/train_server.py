@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Fork-server for train.py.
+
+Imports torch and loads MNIST once, then forks a fresh child for every job so
+each run still starts from a clean process without paying interpreter, torch
+and dataset startup again.
+
+Protocol (one job per connection on a Unix socket):
+    request:  {"argv": ["--dataset_size", "500", "--epochs", "3"]}\\n
+    response: {"stdout": "...", "stderr": "...", "returncode": 0, "metrics": ["<json line>", ...],
+               "rusage": {"ru_utime": ..., ...}, "wall_time": 1.2}\\n
+
+Usage:
+    python mnist67/train_server.py --socket /tmp/mnist67.sock
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import signal
+import socket
+import tempfile
+import time
+import traceback
+
+import train
+
+
+def read_line(conn):
+    """Read a single newline-terminated message from a socket."""
+    chunks = []
+    while True:
+        chunk = conn.recv(65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        if chunk.endswith(b"\n"):
+            break
+    return b"".join(chunks).decode()
+
+
+# struct rusage fields sent back with each job (runner.run_on_server normalizes them)
+RUSAGE_FIELDS = ("ru_utime", "ru_stime", "ru_maxrss", "ru_nvcsw", "ru_nivcsw", "ru_inblock", "ru_oublock")
+
+
+def run_job(conn):
+    """Run one train.py invocation in the current (forked) process."""
+    started = time.perf_counter()
+    request = json.loads(read_line(conn))
+    stdout, stderr = io.StringIO(), io.StringIO()
+    returncode = 0
+    # Same JSON-lines sidecar a subprocess run would get (see runner.METRICS_ENV)
+    fd, metrics_path = tempfile.mkstemp(prefix="metrics-", suffix=".jsonl")
+    os.close(fd)
+    os.environ["MLLLM_METRICS_FILE"] = metrics_path
+    with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+        try:
+            train.main(request["argv"])
+        except SystemExit as e:
+            # argparse reports bad flags through SystemExit
+            returncode = e.code if isinstance(e.code, int) else 1
+        except Exception:
+            traceback.print_exc()
+            returncode = 1
+    with open(metrics_path) as f:
+        metrics = f.read().splitlines()
+    os.unlink(metrics_path)
+    # A forked child starts with zeroed counters, so RUSAGE_SELF covers just this job
+    # (peak RSS includes the pages shared with the pre-loaded server)
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    reply = {
+        "stdout": stdout.getvalue(),
+        "stderr": stderr.getvalue(),
+        "returncode": returncode,
+        "metrics": metrics,
+        "rusage": {field: getattr(usage, field) for field in RUSAGE_FIELDS},
+        "wall_time": time.perf_counter() - started,
+    }
+    conn.sendall(json.dumps(reply).encode() + b"\n")
+
+
+def serve(socket_path):
+    """Accept jobs forever, forking one child per job."""
+    # Only load the data source here; the 6-vs-7 split runs per job in the child
+    train.load_6_vs_7_source()
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen(128)
+
+    # Let the kernel reap finished children
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    print(f"Training server listening on {socket_path}", flush=True)
+
+    try:
+        while True:
+            conn, _ = server.accept()
+            if os.fork() == 0:
+                server.close()
+                try:
+                    run_job(conn)
+                finally:
+                    conn.close()
+                    os._exit(0)
+            conn.close()
+    finally:
+        server.close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve train.py jobs from a pre-loaded fork-server")
+    parser.add_argument("--socket", type=str, default="/tmp/mnist67_train.sock")
+    args = parser.parse_args()
+    serve(args.socket)
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Built-in scaling-law fitting and rendering.
+
+Fits L(N) = a * N^b (optionally + c, an irreducible loss) on a log-log scale
+with vectorized NumPy, bootstraps confidence bands by resampling seeds within
+each data level, and renders the PNG in-process with matplotlib. Used by
+console_logs_to_png.plot_from_logs instead of asking an LLM for plotting code.
+"""
+import os
+import re
+import sys
+
+import numpy as np
+
+# The log parser lives with the backend services
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "App", "backend"))
+from analyzer import Analyzer, FinalMetrics  # noqa: E402
+
+# Trex palette first, then matplotlib's defaults
+COLORS = ["#00b4f0", "#b428ff", "#ff7f0e", "#2ca02c", "#d62728", "#8c564b", "#e377c2"]
+
+SCALING_LAW_PATTERN = re.compile(r"scaling[\s_-]*law|log[\s-]*log|power[\s-]*law", re.IGNORECASE)
+
+
+def match_plot_type(plotting_request: str):
+    """Return the name of the built-in plot that serves a request, or None."""
+    if SCALING_LAW_PATTERN.search(plotting_request):
+        return "scaling_law"
+    return None
+
+
+def _linear_fit(log_x, log_y):
+    """Least-squares fit of log_y = intercept + slope * log_x along the last axis."""
+    x_mean = log_x.mean(axis=-1, keepdims=True)
+    y_mean = log_y.mean(axis=-1, keepdims=True)
+    dx = log_x - x_mean
+    slope = (dx * (log_y - y_mean)).sum(axis=-1) / (dx * dx).sum(axis=-1)
+    intercept = y_mean[..., 0] - slope * x_mean[..., 0]
+    return intercept, slope
+
+
+def fit_power_law(x, y, irreducible=False, num_offsets=200):
+    """
+    Fit y = a * x^b (+ c) in log space.
+
+    Args:
+        x: Array of shape (n,)
+        y: Array of shape (n,) or (batch, n) to fit many curves at once
+        irreducible: Also fit an irreducible-loss offset c >= 0
+        num_offsets: Grid resolution for c (the grid search is vectorized)
+
+    Returns:
+        (a, b, c) arrays with the batch shape of y (c is 0 without irreducible)
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    log_x = np.log(x)
+    if not irreducible:
+        intercept, slope = _linear_fit(np.broadcast_to(log_x, y.shape), np.log(y))
+        return np.exp(intercept), slope, np.zeros_like(slope)
+
+    # Candidate offsets in [0, min(y)) for every curve: (..., num_offsets, 1)
+    fractions = np.linspace(0.0, 0.99, num_offsets)
+    offsets = y.min(axis=-1, keepdims=True)[..., None, :] * fractions[:, None]
+    log_residual = np.log(y[..., None, :] - offsets)
+    log_x_grid = np.broadcast_to(log_x, log_residual.shape)
+    intercept, slope = _linear_fit(log_x_grid, log_residual)
+    predicted = intercept[..., None] + slope[..., None] * log_x_grid
+    sse = ((log_residual - predicted) ** 2).sum(axis=-1)
+    best = sse.argmin(axis=-1)[..., None]
+
+    def take(values):
+        return np.take_along_axis(values, best, axis=-1)[..., 0]
+
+    return np.exp(take(intercept)), take(slope), take(offsets[..., 0])
+
+
+def bootstrap_band(levels, samples, grid, irreducible=False, num_bootstrap=1000, seed=0):
+    """
+    Confidence band for the fit by resampling seeds within each data level.
+
+    Args:
+        levels: Sorted unique x values
+        samples: List of 1-D arrays, the per-seed y values at each level
+        grid: x values at which to evaluate the band
+
+    Returns:
+        (lower, upper) arrays over grid (2.5th / 97.5th percentiles)
+    """
+    rng = np.random.default_rng(seed)
+    # (num_bootstrap, num_levels) matrix of resampled per-level means
+    means = np.stack([
+        s[rng.integers(0, len(s), size=(num_bootstrap, len(s)))].mean(axis=1)
+        for s in samples
+    ], axis=1)
+    a, b, c = fit_power_law(levels, means, irreducible=irreducible)
+    curves = a[:, None] * grid[None, :] ** b[:, None] + c[:, None]
+    return np.percentile(curves, 2.5, axis=0), np.percentile(curves, 97.5, axis=0)
+
+
+def points_from_records(records, x_key="dataset_size", series_key=None):
+    """Group parsed FinalMetrics into {series: (x array, y array)}."""
+    series = {}
+    for record in records:
+        if not isinstance(record, FinalMetrics):
+            continue
+        x = record.hyperparameters.get(x_key)
+        if x is None or record.val_loss <= 0:
+            continue
+        label = record.hyperparameters.get(series_key) if series_key else None
+        xs, ys = series.setdefault(label, ([], []))
+        xs.append(float(x))
+        ys.append(record.val_loss)
+    return {k: (np.array(xs), np.array(ys)) for k, (xs, ys) in series.items()}
+
+
+def plot_scaling_law(
+    series,
+    output_path,
+    x_label="Dataset size",
+    y_label="Validation loss",
+    series_key=None,
+    irreducible=False,
+    num_bootstrap=1000,
+):
+    """
+    Render a log-log scaling-law plot with fitted lines and bootstrap bands.
+
+    Args:
+        series: {label: (x array, y array)} as returned by points_from_records
+        output_path: Where to save the PNG
+        series_key: Name shown in the legend next to each series label
+        irreducible: Fit L = a * N^b + c instead of a pure power law
+        num_bootstrap: Bootstrap resamples for the confidence band (0 disables it)
+
+    Returns:
+        {label: {"a": ..., "b": ..., "c": ...}} fitted parameters
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(8, 6))
+    fits = {}
+    for i, (label, (x, y)) in enumerate(sorted(series.items(), key=lambda kv: str(kv[0]))):
+        color = COLORS[i % len(COLORS)]
+        levels = np.unique(x)
+        samples = [y[x == level] for level in levels]
+        level_means = np.array([s.mean() for s in samples])
+        if len(levels) < 2:
+            ax.scatter(x, y, color=color, alpha=0.5, s=18)
+            continue
+
+        a, b, c = (float(v) for v in fit_power_law(levels, level_means, irreducible=irreducible))
+        fits[label] = {"a": a, "b": b, "c": c}
+
+        grid = np.geomspace(levels[0], levels[-1], 200)
+        name = f"{series_key}={label}" if series_key else "runs"
+        fit_label = f"fit: {a:.3g}·N^{b:.3f}" + (f" + {c:.3g}" if irreducible else "")
+        ax.scatter(x, y, color=color, alpha=0.35, s=18, label=name)
+        ax.scatter(levels, level_means, color=color, edgecolor="black", s=45, zorder=3)
+        ax.plot(grid, a * grid ** b + c, color=color, linewidth=2, label=fit_label)
+        if num_bootstrap and any(len(s) > 1 for s in samples):
+            lower, upper = bootstrap_band(levels, samples, grid, irreducible, num_bootstrap)
+            ax.fill_between(grid, lower, upper, color=color, alpha=0.15, linewidth=0)
+
+    ax.set_xscale("log")
+    ax.set_yscale("log")
+    ax.set_xlabel(x_label)
+    ax.set_ylabel(y_label)
+    ax.set_title("Scaling law")
+    ax.grid(True, which="both", alpha=0.3)
+    ax.legend()
+    fig.tight_layout()
+    fig.savefig(output_path, dpi=150)
+    plt.close(fig)
+    return fits
+
+
+def scaling_law_from_logs(console_logs, output_path, x_key="dataset_size", series_key=None, irreducible=False):
+    """
+    Parse console logs and render a scaling-law plot.
+
+    Returns:
+        Fitted parameters, or None if the logs do not contain at least two
+        data levels of parseable final validation losses
+    """
+    series = points_from_records(Analyzer().parse_logs(console_logs), x_key, series_key)
+    if not any(len(np.unique(x)) >= 2 for x, _ in series.values()):
+        return None
+    return plot_scaling_law(series, output_path, series_key=series_key, irreducible=irreducible)
@@ -0,0 +1,149 @@
+# resources.py
+"""
+Per-run resource accounting for training processes.
+
+Every train.py execution reports what it cost the host: user/system CPU
+seconds, peak RSS, voluntary/involuntary context switches, block I/O and
+wall time (from the kernel's rusage for the child, via os.wait4). Sweeps
+aggregate these to show how many runs the machine can hold at once before
+CPU or memory runs out.
+
+Example:
+    process = subprocess.Popen(argv)
+    returncode, usage = wait_with_rusage(process, started)
+    print(format_sweep_usage(aggregate_usage([usage, ...])))
+"""
+import os
+import sys
+import time
+
+# Output key -> struct rusage field
+RUSAGE_FIELDS = {
+    "user_time": "ru_utime",
+    "system_time": "ru_stime",
+    "max_rss": "ru_maxrss",
+    "voluntary_ctx_switches": "ru_nvcsw",
+    "involuntary_ctx_switches": "ru_nivcsw",
+    "read_blocks": "ru_inblock",
+    "write_blocks": "ru_oublock",
+}
+
+# ru_maxrss is in kilobytes on Linux and in bytes on macOS
+_MAXRSS_PER_MB = 1024 * 1024 if sys.platform == "darwin" else 1024
+
+
+def usage_from_rusage(rusage, wall_time: float) -> dict:
+    """
+    Normalize a resource.struct_rusage (or a dict of its ru_* fields).
+
+    Returns:
+        Dict with user_time/system_time/wall_time (s), max_rss_mb,
+        voluntary/involuntary_ctx_switches, read/write_blocks and
+        cpu_utilization (CPU seconds per wall second; ~N for N busy cores)
+    """
+    get = rusage.get if isinstance(rusage, dict) else lambda field: getattr(rusage, field)
+    raw = {key: get(field) for key, field in RUSAGE_FIELDS.items()}
+    cpu_time = raw["user_time"] + raw["system_time"]
+    return {
+        "user_time": raw["user_time"],
+        "system_time": raw["system_time"],
+        "wall_time": wall_time,
+        "cpu_utilization": cpu_time / wall_time if wall_time > 0 else None,
+        "max_rss_mb": raw["max_rss"] / _MAXRSS_PER_MB,
+        "voluntary_ctx_switches": raw["voluntary_ctx_switches"],
+        "involuntary_ctx_switches": raw["involuntary_ctx_switches"],
+        "read_blocks": raw["read_blocks"],
+        "write_blocks": raw["write_blocks"],
+    }
+
+
+def wait_with_rusage(process, started: float):
+    """
+    Wait for a subprocess.Popen and collect its rusage.
+
+    Args:
+        started: time.perf_counter() taken just before the process was started
+
+    Returns:
+        (returncode, usage dict or None). None when os.wait4 is unavailable
+        or another thread already reaped the process.
+    """
+    if not hasattr(os, "wait4"):
+        return process.wait(), None
+    try:
+        _, status, rusage = os.wait4(process.pid, 0)
+    except ChildProcessError:
+        return process.wait(), None
+    # Popen did not reap the child itself; tell it the exit code so poll()/wait() don't try
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return process.returncode, usage_from_rusage(rusage, time.perf_counter() - started)
+
+
+def aggregate_usage(usages, cpu_count=None, memory_mb=None) -> dict:
+    """
+    Sweep totals and peaks over per-run usage dicts (None entries are skipped).
+
+    Also estimates how many runs like these fit on the host at once: CPUs
+    divided by the mean CPU utilization, and physical memory divided by the
+    largest peak RSS; max_parallel_runs is the smaller of the two.
+    """
+    usages = [u for u in usages if u]
+    if not usages:
+        return {"runs": 0}
+    cpu_count = cpu_count or os.cpu_count() or 1
+    memory_mb = memory_mb if memory_mb is not None else physical_memory_mb()
+    cpu_times = [u["user_time"] + u["system_time"] for u in usages]
+    utilizations = [u["cpu_utilization"] for u in usages if u.get("cpu_utilization")]
+    peak_rss = max(u["max_rss_mb"] for u in usages)
+    mean_utilization = sum(utilizations) / len(utilizations) if utilizations else None
+    by_cpu = max(1, int(cpu_count / mean_utilization)) if mean_utilization else None
+    by_memory = max(1, int(memory_mb / peak_rss)) if memory_mb and peak_rss else None
+    limits = [n for n in (by_cpu, by_memory) if n is not None]
+    return {
+        "runs": len(usages),
+        "cpu_time": sum(cpu_times),
+        "user_time": sum(u["user_time"] for u in usages),
+        "system_time": sum(u["system_time"] for u in usages),
+        "wall_time": sum(u["wall_time"] for u in usages),
+        "max_cpu_time": max(cpu_times),
+        "mean_cpu_utilization": mean_utilization,
+        "peak_rss_mb": peak_rss,
+        "mean_peak_rss_mb": sum(u["max_rss_mb"] for u in usages) / len(usages),
+        "voluntary_ctx_switches": sum(u["voluntary_ctx_switches"] for u in usages),
+        "involuntary_ctx_switches": sum(u["involuntary_ctx_switches"] for u in usages),
+        "read_blocks": sum(u.get("read_blocks", 0) for u in usages),
+        "write_blocks": sum(u.get("write_blocks", 0) for u in usages),
+        "parallel_runs_by_cpu": by_cpu,
+        "parallel_runs_by_memory": by_memory,
+        "max_parallel_runs": min(limits) if limits else None,
+    }
+
+
+def physical_memory_mb():
+    """Total physical memory in MB, or None where sysconf can't tell."""
+    try:
+        return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def format_sweep_usage(summary: dict) -> str:
+    """Human-readable summary of aggregate_usage."""
+    if not summary.get("runs"):
+        return "Resources: no runs measured"
+    utilization = summary["mean_cpu_utilization"]
+    lines = [
+        f"Resources ({summary['runs']} runs):",
+        f"  CPU time: {summary['cpu_time']:.1f}s (user {summary['user_time']:.1f}s, system {summary['system_time']:.1f}s)"
+        f" over {summary['wall_time']:.1f}s of run wall time"
+        + ("" if utilization is None else f", {utilization:.1f} cores busy per run on average"),
+        f"  Peak RSS: {summary['peak_rss_mb']:.0f} MB max, {summary['mean_peak_rss_mb']:.0f} MB mean",
+        f"  Context switches: {summary['voluntary_ctx_switches']:,} voluntary, "
+        f"{summary['involuntary_ctx_switches']:,} involuntary",
+    ]
+    if summary["max_parallel_runs"] is not None:
+        lines.append(
+            f"  Parallel runs this host fits: ~{summary['max_parallel_runs']} "
+            f"(CPU: {summary['parallel_runs_by_cpu'] or '-'}, memory: {summary['parallel_runs_by_memory'] or '-'})"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,152 @@
+# run_cache.py
+"""
+Content-addressed cache of training run results.
+
+A run is keyed by the source hash of the training script and the local
+modules it imports (e.g. mnist67/data_cache.py), the state of the
+preprocessed dataset files, its normalized --flag values and its seed, so
+re-running a sweep (or a duplicate command from the planner) returns the
+stored stdout/stderr/metrics instead of retraining. Commands without --seed
+are nondeterministic and always run. Results are written as soon as each run finishes, so the cache
+also works as a resume journal: restarting a sweep that crashed halfway only
+runs the commands that never completed. Entries are evicted least recently
+used first once the cache grows past max_bytes.
+"""
+import ast
+import hashlib
+import json
+import os
+import shlex
+
+from disk_cache import DiskCache
+
+# Flags that only change where output goes or how it is reached, not what is computed
+IGNORED_FLAGS = {"metrics_file", "checkpoint_dir", "resume"}
+
+# Generated data files (relative to the script's directory) that runs read;
+# rebuilding them changes their size/mtime and so the key
+DATA_FILES = ("cache/mnist67_train_images.npy", "cache/mnist67_train_labels.npy")
+
+
+def _normalize_value(value: str) -> str:
+    """Canonical text for a flag value so 1e-3 and 0.001 share a key."""
+    try:
+        return repr(float(value))
+    except ValueError:
+        return value
+
+
+def normalize_args(argv) -> dict:
+    """Turn ["--lr", "1e-3", "--flag"] into {"lr": "0.001", "flag": "true"}."""
+    args = {}
+    i = 0
+    while i < len(argv):
+        token = argv[i]
+        i += 1
+        if not token.startswith("--"):
+            continue
+        name, has_value, value = token[2:].partition("=")
+        if not has_value:
+            if i < len(argv) and not argv[i].startswith("--"):
+                value = argv[i]
+                i += 1
+            else:
+                value = "true"
+        if name not in IGNORED_FLAGS:
+            args[name] = _normalize_value(value)
+    return args
+
+
+class RunCache(DiskCache):
+    """
+    Disk-backed run result cache with size-based LRU eviction.
+
+    Args:
+        cache_dir: Directory holding one JSON file per cached run
+        max_bytes: Evict least recently used entries beyond this total size
+    """
+
+    def __init__(self, cache_dir: str = ".run_cache", max_bytes: int = 512 * 1024 * 1024):
+        super().__init__(cache_dir, max_bytes)
+        self._source_hashes = {}
+        self._imports = {}
+
+    def _source_hash(self, script_path: str) -> str:
+        stat = os.stat(script_path)
+        memo_key = (os.path.abspath(script_path), stat.st_mtime_ns, stat.st_size)
+        if memo_key not in self._source_hashes:
+            with open(script_path, "rb") as f:
+                self._source_hashes[memo_key] = hashlib.sha256(f.read()).hexdigest()
+        return self._source_hashes[memo_key]
+
+    def _imported_names(self, path: str) -> list:
+        """Top-level module names a file imports (absolute imports only)."""
+        stat = os.stat(path)
+        memo_key = (path, stat.st_mtime_ns, stat.st_size)
+        if memo_key not in self._imports:
+            names = []
+            with open(path, "rb") as f:
+                try:
+                    tree = ast.parse(f.read())
+                except SyntaxError:
+                    tree = None
+            for node in ast.walk(tree) if tree is not None else ():
+                if isinstance(node, ast.Import):
+                    names.extend(alias.name.split(".")[0] for alias in node.names)
+                elif isinstance(node, ast.ImportFrom) and not node.level and node.module:
+                    names.append(node.module.split(".")[0])
+            self._imports[memo_key] = names
+        return self._imports[memo_key]
+
+    def _local_modules(self, script_path: str) -> list:
+        """The script plus every module it (transitively) imports from its own directory."""
+        directory = os.path.dirname(os.path.abspath(script_path))
+        found, pending = set(), [os.path.abspath(script_path)]
+        while pending:
+            path = pending.pop()
+            if path in found:
+                continue
+            found.add(path)
+            for name in self._imported_names(path):
+                module_path = os.path.join(directory, name + ".py")
+                if os.path.exists(module_path):
+                    pending.append(module_path)
+        return sorted(found)
+
+    def key_for(self, command: str):
+        """Return the cache key for a "python [opts] .../train.py --flags" command.
+
+        None (run uncached) when the command can't be keyed or sets no --seed:
+        unseeded runs differ every time, so replicates must not share a result.
+        """
+        try:
+            tokens = shlex.split(command)
+        except ValueError:
+            return None  # unbalanced quotes: treat as a miss
+        position = next((i for i, token in enumerate(tokens) if token.endswith("train.py")), None)
+        if position is None or not os.path.exists(tokens[position]):
+            return None
+        script_path = tokens[position]
+        directory = os.path.dirname(os.path.abspath(script_path))
+        args = normalize_args(tokens[position + 1:])
+        seed = args.pop("seed", None)
+        if seed is None:
+            return None
+        sources = {os.path.basename(path): self._source_hash(path) for path in self._local_modules(script_path)}
+        data = {}
+        for name in DATA_FILES:
+            path = os.path.join(directory, name)
+            if os.path.exists(path):
+                stat = os.stat(path)
+                data[name] = [stat.st_size, stat.st_mtime_ns]
+        payload = json.dumps({"sources": sources, "data": data, "args": args, "seed": seed}, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key: str):
+        """Return the stored result for key, or None."""
+        entry = self.read(key)
+        return entry["result"] if entry is not None else None
+
+    def put(self, key: str, command: str, result: dict):
+        """Store a finished run's result and evict old entries if needed."""
+        self.write(key, {"command": command, "result": result})
@@ -1,26 +1,257 @@
 # runner.py
 import subprocess
 import shlex
+import socket
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-def run_safe_command(command: str):
-    """Executes python train.py safely and returns raw stdout+stderr."""
+from resources import usage_from_rusage, wait_with_rusage
+from streaming import read_lines
 
-    if not command.startswith("python ") or "train.py" not in command:
-        return {"stdout": "", "stderr": f"Blocked unsafe command: {command}"}
-    print(command)
-    process = subprocess.Popen(
-        shlex.split(command),
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-    )
-
-    out, err = process.communicate()
-    print(out)
-    print(err)
+# train.py appends JSON-lines metric events to the file named here
+METRICS_ENV = "MLLLM_METRICS_FILE"
+
+
+def parse_metrics(lines):
+    """
+    Parse JSON-lines metric events written by train.py.
+
+    Returns:
+        Dict with "events" (every event, in order) and "metrics" (the final
+        event of each run: one per seed)
+    """
+    events = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            events.append(json.loads(line))
+        except json.JSONDecodeError:
+            continue  # partial line from a killed run
+    return {
+        "events": events,
+        "metrics": [e for e in events if e.get("event") == "final"],
+    }
+
+
+def run_on_server(command: str, server: str, threads: int = None):
+    """Sends a train.py command to a running mnist67/train_server.py and returns its output."""
+    argv = shlex.split(command)[2:]  # drop "python path/to/train.py"
+    # The server has already initialized torch, so OMP_NUM_THREADS would come too late
+    if threads and not any(a == "--intra_op_threads" or a.startswith("--intra_op_threads=") for a in argv):
+        argv += ["--intra_op_threads", str(threads)]
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(server)
+        sock.sendall(json.dumps({"argv": argv}).encode() + b"\n")
+        chunks = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    reply = json.loads(b"".join(chunks).decode())
+    rusage = reply.get("rusage")
     return {
-        "stdout": out.decode(),
-        "stderr": err.decode()
+        "stdout": reply["stdout"],
+        "stderr": reply["stderr"],
+        "returncode": reply["returncode"],
+        "rusage": usage_from_rusage(rusage, reply["wall_time"]) if rusage else None,
+        **parse_metrics(reply.get("metrics", [])),
+    }
+
+
+def run_safe_command(command: str, server: str = None, cache=None, threads: int = None):
+    """
+    Executes python train.py safely and returns raw stdout+stderr plus the
+    structured metrics the script wrote to its JSON-lines sidecar file
+    (see parse_metrics) and the child's resource usage as "rusage" (see
+    resources.usage_from_rusage; None if it could not be measured).
+
+    If server is the socket path of a running mnist67/train_server.py, the job
+    is forked from that pre-loaded worker instead of a fresh interpreter.
+
+    If cache is a run_cache.RunCache, a previously stored result for the same
+    script source, arguments and seed is returned without running anything,
+    and successful runs are stored as soon as they finish.
+
+    threads caps the run's intra-op CPU threads (OMP_NUM_THREADS, or
+    --intra_op_threads on the train server) so parallel runs don't
+    oversubscribe the host; None leaves torch's default.
+    """
+
+    if not is_safe_command(command):
+        return {"stdout": "", "stderr": f"Blocked unsafe command: {command}", "returncode": None, "events": [], "metrics": []}
+    try:
+        shlex.split(command)
+    except ValueError as e:
+        return {"stdout": "", "stderr": f"Could not parse command ({e}): {command}", "returncode": None, "events": [], "metrics": []}
+    print(command)
+    key = cache.key_for(command) if cache is not None else None
+    if key is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            print(f"Cache hit: {command}")
+            return {**cached, "cached": True}
+
+    out = _execute(command, server, threads)
+    if key is not None and out["returncode"] == 0:
+        cache.put(key, command, out)
+    return out
+
+
+def _execute(command: str, server: str = None, threads: int = None):
+    if server:
+        out = run_on_server(command, server, threads)
+        print(out["stdout"])
+        print(out["stderr"])
+        return out
+    stdout, stderr, events = [], [], []
+    returncode = rusage = None
+    for kind, item in stream_command(command, threads):
+        if kind == "stdout":
+            stdout.append(item + "\n")
+        elif kind == "stderr":
+            stderr.append(item + "\n")
+        elif kind == "metrics":
+            events.append(item)
+        elif kind == "rusage":
+            rusage = item
+        else:
+            returncode = item
+    out = {
+        "stdout": "".join(stdout),
+        "stderr": "".join(stderr),
+        "returncode": returncode,
+        "rusage": rusage,
+        "events": events,
+        "metrics": [e for e in events if e.get("event") == "final"],
     }
+    print(out["stdout"])
+    print(out["stderr"])
+    return out
+
+
+def is_safe_command(command: str) -> bool:
+    return command.startswith("python ") and "train.py" in command
+
+
+def stream_command(command: str, threads: int = None):
+    """
+    Run a train.py command and yield its output while it runs.
+
+    threads, if given, is exported as OMP_NUM_THREADS/MKL_NUM_THREADS.
+
+    Yields:
+        ("stdout", line) / ("stderr", line) for each line of output,
+        ("metrics", event) for each JSON-lines metric event (see parse_metrics),
+        ("rusage", usage) with the process's resource usage once it has exited
+        (see resources.usage_from_rusage; skipped if unavailable),
+        and finally ("exit", returncode)
+    """
+    if not is_safe_command(command):
+        yield "stderr", f"Blocked unsafe command: {command}"
+        yield "exit", None
+        return
+
+    # Metric events come back over a pipe instead of a file so they stream too
+    metrics_read, metrics_write = os.pipe()
+    started = time.perf_counter()
+    try:
+        process = subprocess.Popen(
+            shlex.split(command),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env={**os.environ, **thread_env(threads), METRICS_ENV: f"/dev/fd/{metrics_write}"},
+            pass_fds=(metrics_write,),
+        )
+    except BaseException:
+        os.close(metrics_read)
+        raise
+    finally:
+        os.close(metrics_write)
+
+    streams = {
+        "stdout": process.stdout,
+        "stderr": process.stderr,
+        "metrics": os.fdopen(metrics_read, "rb", buffering=0),
+    }
+    try:
+        for name, line in read_lines(streams):
+            if name != "metrics":
+                yield name, line
+                continue
+            events = parse_metrics([line])["events"]
+            if events:
+                yield "metrics", events[0]
+        returncode, rusage = wait_with_rusage(process, started)
+        if rusage is not None:
+            yield "rusage", rusage
+        yield "exit", returncode
+    finally:
+        # Consumer stopped early: don't leave the training process behind
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        for stream in streams.values():
+            stream.close()
+
+
+def threads_per_run(max_workers: int) -> int:
+    """CPU threads each of max_workers concurrent runs gets."""
+    return max(1, (os.cpu_count() or 1) // max(1, max_workers))
+
+
+def thread_env(threads: int = None) -> dict:
+    """Environment limiting torch's intra-op thread pool (empty for None)."""
+    if not threads:
+        return {}
+    return {"OMP_NUM_THREADS": str(threads), "MKL_NUM_THREADS": str(threads)}
+
+
+def _timed_run(command: str, submitted: float, **kwargs):
+    started = time.perf_counter()
+    result = run_safe_command(command, **kwargs)
+    return {**result, "queue_wait": started - submitted, "wall_time": time.perf_counter() - started}
+
+
+def run_commands(commands, max_workers=1, on_result=None, server=None, cache=None):
+    """
+    Run many train.py commands concurrently, keeping at most max_workers
+    processes alive at once.
+
+    Args:
+        commands: List of command strings (see run_safe_command)
+        max_workers: Maximum number of training processes running at once;
+            each gets cpu_count // max_workers intra-op threads
+        on_result: Optional callback(index, command, result) invoked as each
+            command finishes (in completion order)
+        server: Optional train_server.py socket path (see run_safe_command)
+        cache: Optional run_cache.RunCache (see run_safe_command)
+
+    Returns:
+        List of run_safe_command results in the same order as commands, each
+        with "queue_wait" (seconds spent waiting for a free worker) and
+        "wall_time" (seconds the command itself took)
+    """
+    results = [None] * len(commands)
+    threads = threads_per_run(max_workers)
+    # Each worker thread just blocks on its child process, so threads are
+    # enough to keep N training processes busy.
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        submitted = time.perf_counter()
+        futures = {
+            pool.submit(_timed_run, cmd, submitted, server=server, cache=cache, threads=threads): i
+            for i, cmd in enumerate(commands)
+        }
+        for future in as_completed(futures):
+            i = futures[future]
+            results[i] = future.result()
+            if on_result is not None:
+                on_result(i, commands[i], results[i])
+    return results
 
 
 tools = [
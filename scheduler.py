@@ -0,0 +1,208 @@
+# scheduler.py
+"""
+Successive-halving scheduler for planned training sweeps.
+
+Instead of training every planned command for its full --epochs, all
+commands first run at a small epoch budget; only the best 1/eta of them by
+validation loss continue to the next budget (eta times larger), and so on
+until the survivors run at their full --epochs. Commands are executed with
+runner.run_commands, so the run cache and train server work unchanged.
+With a checkpoint directory, survivors resume from the checkpoint of the
+previous rung (train.py --checkpoint_dir/--resume) and only pay for the
+extra epochs.
+
+Compute is accounted in epochs and in sample-epochs (epochs x
+--dataset_size, when the command sets it) and compared against the full
+grid.
+
+Example:
+    schedule = successive_halving(commands, min_epochs=1, eta=3, max_workers=4)
+    print(format_report(schedule["report"]))
+"""
+import math
+import re
+import shlex
+import time
+
+from runner import run_commands
+
+# Default of --epochs in mnist67/train.py, used when a command does not set it
+DEFAULT_EPOCHS = 3
+
+_FINAL_LOSS_RE = re.compile(r"Final [Vv]alidation [Ll]oss: ([-+]?\d*\.?\d+(?:[eE][-+]?\d+)?)")
+
+
+def get_flag(command: str, name: str):
+    """Value of --name in a command ("--name value" or "--name=value"), or None."""
+    tokens = shlex.split(command)
+    for i, token in enumerate(tokens):
+        if token == f"--{name}" and i + 1 < len(tokens):
+            return tokens[i + 1]
+        if token.startswith(f"--{name}="):
+            return token.split("=", 1)[1]
+    return None
+
+
+def set_flag(command: str, name: str, value) -> str:
+    """Return the command with --name set to value (replaced in place or appended)."""
+    tokens = shlex.split(command)
+    for i, token in enumerate(tokens):
+        if token == f"--{name}" and i + 1 < len(tokens):
+            tokens[i + 1] = str(value)
+            return shlex.join(tokens)
+        if token.startswith(f"--{name}="):
+            tokens[i] = f"--{name}={value}"
+            return shlex.join(tokens)
+    return shlex.join([*tokens, f"--{name}", str(value)])
+
+
+def add_switch(command: str, name: str) -> str:
+    """Return the command with the value-less flag --name added (if missing)."""
+    tokens = shlex.split(command)
+    return command if f"--{name}" in tokens else shlex.join([*tokens, f"--{name}"])
+
+
+def validation_loss(result: dict) -> float:
+    """Mean final validation loss of a run result (inf for failed or unparseable runs)."""
+    if result.get("returncode") not in (0, None) and not result.get("metrics"):
+        return math.inf
+    losses = [m["val_loss"] for m in result.get("metrics", []) if m.get("val_loss") is not None]
+    if not losses:
+        losses = [float(v) for v in _FINAL_LOSS_RE.findall(result.get("stdout", ""))]
+    return sum(losses) / len(losses) if losses else math.inf
+
+
+def epochs_trained(result: dict, budget: int) -> int:
+    """Epochs a run actually trained (early stopping can end it before budget; resuming skips epochs)."""
+    metrics = result.get("metrics", [])
+    stopped = [m["stopped_epoch"] for m in metrics if m.get("stopped_epoch")]
+    resumed = max((m.get("resumed_epoch") or 0 for m in metrics), default=0)
+    return max(0, (max(stopped) if stopped else budget) - resumed)
+
+
+def rung_budgets(max_epochs: int, min_epochs: int, eta: int) -> list:
+    """Epoch budgets min_epochs, min_epochs*eta, ... ending at max_epochs."""
+    if min_epochs < 1:
+        raise ValueError(f"min_epochs must be at least 1, got {min_epochs}")
+    if eta < 2:
+        raise ValueError(f"eta must be at least 2, got {eta}")
+    budgets = []
+    budget = min_epochs
+    while budget < max_epochs:
+        budgets.append(budget)
+        budget *= eta
+    budgets.append(max_epochs)
+    return budgets
+
+
+def successive_halving(commands, min_epochs=1, eta=3, max_workers=1, on_result=None, server=None, cache=None,
+                       checkpoint_dir=None):
+    """
+    Run commands with successive halving on --epochs.
+
+    Args:
+        commands: Planned train.py commands; each one's --epochs is its full budget
+        min_epochs: Epoch budget of the first rung
+        eta: Keep the best 1/eta of the runs at each rung; budgets grow by eta
+        on_result: Optional callback(index, command, result) as each run finishes
+            (index refers to the original commands list)
+        checkpoint_dir: Pass --checkpoint_dir/--resume so each rung continues
+            from the previous one instead of retraining from scratch (commands
+            without --seed retrain, since train.py only checkpoints seeded runs)
+        max_workers, server, cache: Passed to runner.run_commands
+
+    Returns:
+        Dict with "results" (the last result of every original command, in
+        order), "commands" (the command that produced each of those results),
+        "events" (each command's metric events across all rungs: a resumed
+        rung only reports its new epochs, so earlier rungs' epochs are kept),
+        "final" (indices of the commands that reached their full budget) and
+        "report" (rungs and compute compared with the full grid)
+    """
+    start = time.perf_counter()
+    if checkpoint_dir:
+        commands = [add_switch(set_flag(cmd, "checkpoint_dir", checkpoint_dir), "resume") for cmd in commands]
+    full_epochs = [int(get_flag(cmd, "epochs") or DEFAULT_EPOCHS) for cmd in commands]
+    sizes = [int(get_flag(cmd, "dataset_size") or 0) for cmd in commands]
+    budgets = rung_budgets(max(full_epochs, default=0), min_epochs, eta)
+
+    results = [None] * len(commands)
+    events = [[] for _ in commands]
+    ran = list(commands)
+    used_epochs = used_sample_epochs = 0
+    rungs = []
+    final = []
+    alive = list(range(len(commands)))
+
+    for budget in budgets:
+        if not alive:
+            break
+        rung_commands = [set_flag(commands[i], "epochs", min(budget, full_epochs[i])) for i in alive]
+
+        def report(j, cmd, out, alive=alive):
+            if on_result is not None:
+                on_result(alive[j], cmd, out)
+
+        outputs = run_commands(rung_commands, max_workers=max_workers, on_result=report, server=server, cache=cache)
+        losses = {}
+        for i, cmd, out in zip(alive, rung_commands, outputs):
+            results[i], ran[i] = out, cmd
+            resumed = max((m.get("resumed_epoch") or 0 for m in out.get("metrics", [])), default=0)
+            earlier = [e for e in events[i] if e.get("event") == "epoch" and e.get("epoch", 0) <= resumed]
+            events[i] = earlier + out.get("events", [])
+            losses[i] = validation_loss(out)
+            if not out.get("cached"):
+                trained = epochs_trained(out, min(budget, full_epochs[i]))
+                used_epochs += trained
+                used_sample_epochs += trained * sizes[i]
+
+        # Runs that just trained for their full --epochs are done; the best
+        # 1/eta of the rest go on to the next budget
+        final.extend(i for i in alive if full_epochs[i] <= budget)
+        pending = sorted((i for i in alive if full_epochs[i] > budget), key=lambda i: losses[i])
+        survivors = pending[:max(1, math.ceil(len(pending) / eta))] if pending else []
+        rungs.append({
+            "epochs": budget,
+            "runs": len(alive),
+            "kept": len(survivors),
+            "best_val_loss": min(losses.values()),
+        })
+        alive = survivors
+
+    final.sort()
+    full_grid_epochs = sum(full_epochs)
+    full_grid_sample_epochs = sum(e * s for e, s in zip(full_epochs, sizes))
+    return {
+        "results": results,
+        "commands": ran,
+        "events": events,
+        "final": final,
+        "report": {
+            "rungs": rungs,
+            "used_epochs": used_epochs,
+            "full_grid_epochs": full_grid_epochs,
+            "used_sample_epochs": used_sample_epochs,
+            "full_grid_sample_epochs": full_grid_sample_epochs,
+            "compute_saved": 1 - used_epochs / full_grid_epochs if full_grid_epochs else 0.0,
+            "wall_time": time.perf_counter() - start,
+        },
+    }
+
+
+def format_report(report: dict) -> str:
+    """Human-readable summary of a successive_halving report."""
+    lines = ["Successive halving:"]
+    for rung in report["rungs"]:
+        best = rung["best_val_loss"]
+        best_text = f"{best:.4f}" if best is not None and math.isfinite(best) else "n/a"
+        lines.append(f"  {rung['runs']:>3} runs x {rung['epochs']:>3} epochs -> kept {rung['kept']} (best val loss {best_text})")
+    lines.append(
+        f"  Compute: {report['used_epochs']} epochs vs {report['full_grid_epochs']} for the full grid "
+        f"({report['compute_saved']:.0%} saved)"
+    )
+    if report["full_grid_sample_epochs"]:
+        lines.append(
+            f"  Samples processed: {report['used_sample_epochs']:,} vs {report['full_grid_sample_epochs']:,}"
+        )
+    lines.append(f"  Wall time: {report['wall_time']:.1f}s")
+    return "\n".join(lines)
@@ -0,0 +1,53 @@
+# streaming.py
+"""
+Line-by-line reading of a subprocess's pipes while it runs.
+
+Shared by the command-line runner (runner.stream_command) and the backend
+job runner (App/backend/runner.py), which both need stdout, stderr and the
+metrics pipe as lines as soon as they are written, without a reader thread
+per pipe.
+
+Example:
+    process = subprocess.Popen(argv, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    for name, line in read_lines({"stdout": process.stdout, "stderr": process.stderr}):
+        print(name, line)
+"""
+import os
+import selectors
+
+
+def read_lines(streams):
+    """
+    Multiplex non-blocking reads over several pipes.
+
+    Args:
+        streams: {name: binary file object}; each is closed at its EOF
+
+    Yields:
+        (name, decoded line without trailing newline) as soon as each line is complete
+    """
+    selector = selectors.DefaultSelector()
+    buffers = {}
+    for name, stream in streams.items():
+        os.set_blocking(stream.fileno(), False)
+        selector.register(stream, selectors.EVENT_READ, name)
+        buffers[name] = b""
+    try:
+        while selector.get_map():
+            for key, _ in selector.select():
+                name = key.data
+                try:
+                    chunk = os.read(key.fd, 65536)
+                except BlockingIOError:
+                    continue
+                if not chunk:
+                    selector.unregister(key.fileobj)
+                    key.fileobj.close()
+                    if buffers[name]:
+                        yield name, buffers[name].decode(errors="replace")
+                    continue
+                *lines, buffers[name] = (buffers[name] + chunk).split(b"\n")
+                for line in lines:
+                    yield name, line.decode(errors="replace")
+    finally:
+        selector.close()
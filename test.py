@@ -1,10 +1,23 @@
 from openai import OpenAI
 # from groq import Groq
 import json
+import os
+import sys
+import time
 import argparse
 
-from runner import run_safe_command
+from runner import run_commands
+from scheduler import successive_halving, format_report
+from run_cache import RunCache
+from llm_cache import LLMCache, cached_completion
 from console_logs_to_png import plot_from_logs
+from tracing import Tracer, token_usage
+from resources import aggregate_usage, format_sweep_usage
+
+# Per-epoch metric store and log parsing live with the backend services
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "App", "backend"))
+from analyzer import parse_command_flags  # noqa: E402
+from metric_store import MetricStore  # noqa: E402
 
 # Parse command-line arguments
 parser = argparse.ArgumentParser(description="Generate ML experiments from a user request")
@@ -14,10 +27,82 @@ parser.add_argument(
     required=True,
     help="User request describing what experiments to run (e.g., 'train models on 10%, 20%, 30%... to 100% of data')"
 )
+parser.add_argument(
+    "--max-workers",
+    type=int,
+    default=os.cpu_count() or 1,
+    help="Maximum number of training commands to run at the same time (default: number of CPUs); "
+         "each run is limited to CPUs / max-workers intra-op threads"
+)
+parser.add_argument(
+    "--train-server",
+    type=str,
+    default=None,
+    help="Socket path of a running mnist67/train_server.py to fork training jobs from"
+)
+parser.add_argument(
+    "--run-cache",
+    type=str,
+    default=".run_cache",
+    help="Directory of cached run results; finished runs are reused and a crashed sweep resumes from here"
+)
+parser.add_argument(
+    "--no-run-cache",
+    action="store_true",
+    help="Always retrain, ignoring cached run results"
+)
+parser.add_argument(
+    "--no-llm-cache",
+    action="store_true",
+    help="Always call the LLM instead of reusing a cached response for an identical prompt (fresh responses are still cached)"
+)
+parser.add_argument(
+    "--metric-store",
+    type=str,
+    default=None,
+    help="Directory of the columnar per-epoch metric store; each sweep's curves are saved there"
+)
+parser.add_argument(
+    "--successive-halving",
+    action="store_true",
+    help="Run all commands at --min-epochs first and only continue the best 1/--eta of them to their full --epochs; "
+         "only runs that reach their full --epochs go into the logs, metric store and plot"
+)
+parser.add_argument(
+    "--min-epochs",
+    type=int,
+    default=1,
+    help="Epoch budget of the first successive-halving rung (default: 1)"
+)
+parser.add_argument(
+    "--eta",
+    type=int,
+    default=3,
+    help="Successive-halving reduction factor: keep the best 1/eta of the runs per rung (default: 3)"
+)
+parser.add_argument(
+    "--checkpoint-dir",
+    type=str,
+    default=None,
+    help="With --successive-halving, checkpoint runs here so later rungs resume instead of retraining"
+)
+parser.add_argument(
+    "--trace-file",
+    type=str,
+    default=None,
+    help="Write every pipeline span (LLM calls, commands, log aggregation, plot) here as JSON lines"
+)
 args = parser.parse_args()
+if args.min_epochs < 1:
+    parser.error("--min-epochs must be at least 1")
+if args.eta < 2:
+    parser.error("--eta must be at least 2")
 
 client = OpenAI()
 # client = Groq()
+llm_cache = LLMCache()
+# Per-stage timings, token counts and queue waits; summarized at the end
+tracer = Tracer()
 
 SCRIPT_PATH = "mnist67/train.py"  # Path to your ML script
 
@@ -69,14 +154,21 @@ print("=" * 80)
 print("STEP 1: Generating commands from prompt...")
 print("=" * 80)
 
-plan = client.chat.completions.create(
-    model="gpt-5",
-    response_format={"type": "json_object"},   # Force JSON output
-    messages=[
-        {"role": "system", "content": system_prompt_stage1},
-        {"role": "user", "content": stage1_user_prompt},
-    ],
-)
+with tracer.span("llm_plan", model="gpt-5") as span:
+    hits = llm_cache.hits
+    plan = cached_completion(
+        client,
+        llm_cache,
+        bypass=args.no_llm_cache,
+        model="gpt-5",
+        response_format={"type": "json_object"},   # Force JSON output
+        messages=[
+            {"role": "system", "content": system_prompt_stage1},
+            {"role": "user", "content": stage1_user_prompt},
+        ],
+    )
+    # Cache hits cost no tokens
+    span.set(cached=llm_cache.hits > hits, **({} if llm_cache.hits > hits else token_usage(plan)))
 
 # Parse commands from JSON response
 plan_json = json.loads(plan.choices[0].message.content)
@@ -93,25 +185,97 @@ print("\n" + "=" * 80)
 print("STEP 2: Executing commands and collecting console logs...")
 print("=" * 80)
 console_logs = []  # List to collect all commands and outputs
+print(f"Running {len(commands)} commands with up to {args.max_workers} workers")
+run_cache = None if args.no_run_cache else RunCache(args.run_cache)
 
-for i, cmd in enumerate(commands, 1):
-    print(f"\n[{i}/{len(commands)}] Executing: {cmd}")
-    
+finished = 0
+run_usages = []  # rusage of every execution (all rungs with --successive-halving), cache hits excluded
+
+def report_progress(i, cmd, out):
+    global finished
+    finished += 1
+    if not out.get("cached"):
+        run_usages.append(out.get("rusage"))
+    total = "?" if args.successive_halving else len(commands)
+    print(f"\n✓ [{finished}/{total}] Finished command {i + 1}: {cmd}")
+    tracer.record(
+        "command",
+        out.get("wall_time", 0.0),
+        error=None if out.get("returncode") in (0, None) else f"exit {out['returncode']}",
+        queue_wait=out.get("queue_wait"),
+        cached=bool(out.get("cached")),
+        command=cmd,
+        rusage=out.get("rusage"),
+    )
+
+if args.successive_halving:
+    # Early rungs use fewer epochs; only the runs that reach their full budget are kept below
+    schedule = successive_halving(
+        commands,
+        min_epochs=args.min_epochs,
+        eta=args.eta,
+        max_workers=args.max_workers,
+        on_result=report_progress,
+        server=args.train_server,
+        cache=run_cache,
+        checkpoint_dir=args.checkpoint_dir,
+    )
+    print("\n" + format_report(schedule["report"]))
+    # Runs cut at an early rung trained for fewer epochs and would skew the fit
+    commands = [schedule["commands"][i] for i in schedule["final"]]
+    # With --checkpoint-dir the last rung only reports the epochs it resumed into
+    outputs = [{**schedule["results"][i], "events": schedule["events"][i]} for i in schedule["final"]]
+    print(f"Keeping the {len(commands)} runs that reached their full --epochs")
+else:
+    # Run the actual training commands in parallel
+    outputs = run_commands(
+        commands,
+        max_workers=args.max_workers,
+        on_result=report_progress,
+        server=args.train_server,
+        cache=run_cache,
+    )
+
+print("\n" + format_sweep_usage(aggregate_usage(run_usages)))
+
+aggregation_start = time.perf_counter()
+for i, (cmd, out) in enumerate(zip(commands, outputs), 1):
     # Add command to log
     console_logs.append(f"[{i}/{len(commands)}] Command: {cmd}\n")
-    
-    # Run the actual training command
-    out = run_safe_command(cmd)
-    
+
     # Add output to log
     console_logs.append(f"STDOUT:\n{out['stdout']}\n")
     if out['stderr']:
         console_logs.append(f"STDERR:\n{out['stderr']}\n")
     console_logs.append("-" * 80 + "\n")
 
+# Slowest training phase of every run started with --profile
+profiled = [
+    (i, m["profile"]) for i, out in enumerate(outputs, 1) for m in out.get("metrics", []) if m.get("profile")
+]
+if profiled:
+    print("\nPhase profile (slowest phase per run):")
+    for i, profile in profiled:
+        phases = profile["phases"]
+        slowest = profile["slowest_phase"]
+        share = phases[slowest] / (sum(phases.values()) or 1)
+        throughput = profile["epoch_samples_per_sec"]
+        rate = f", {throughput[-1]:,.0f} samples/s" if throughput else ""
+        print(f"  [{i}] {slowest} {phases[slowest]:.2f}s ({share:.0%}){rate}")
+
+# Save per-epoch curves (structured metric events) for analysis and plotting
+if args.metric_store:
+    metric_store = MetricStore(args.metric_store)
+    sweep = time.strftime("sweep-%Y%m%d-%H%M%S")
+    for i, (cmd, out) in enumerate(zip(commands, outputs), 1):
+        metric_store.append_events(f"{sweep}-{i}", out.get("events", []), parse_command_flags(cmd), sweep=sweep)
+    for path in metric_store.flush(sweep):
+        print(f"✓ Saved per-epoch metrics to {path}")
+
 # Combine all logs into a single string
 console_logs_string = "".join(console_logs)
 print(f"\n✓ Collected console logs: {len(console_logs_string)} characters")
+tracer.record("log_aggregation", time.perf_counter() - aggregation_start, characters=len(console_logs_string))
 
 # ============================================================================
 # STEP 3: CONSOLE LOGS → PNG
@@ -122,15 +286,27 @@ print("=" * 80)
 
 plotting_request = "please make a plot of scaling laws from the above training console logs please make sure to keep everything on a log log scale and to fit a line of best fit. the line of best fit should match the color of the points"
 
+plot_start, plot_error = time.perf_counter(), None
 try:
     plot_path = plot_from_logs(
         console_logs=console_logs_string,
         plotting_request=plotting_request,
         name="scaling_law_plot",
-        model="gpt-4o"
+        model="gpt-4o",
+        llm_cache=llm_cache,
+        bypass_llm_cache=args.no_llm_cache,
+        tracer=tracer,
     )
     print(f"\n✓ Plot successfully generated: {plot_path}")
 except Exception as e:
+    plot_error = type(e).__name__
     print(f"\n✗ Error generating plot: {e}")
     import traceback
-    traceback.print_exc()
\ No newline at end of file
+    traceback.print_exc()
+tracer.record("plot", time.perf_counter() - plot_start, error=plot_error)
+
+print(f"\n{llm_cache.summary()}")
+print(f"\n{tracer.format_summary()}")
+if args.trace_file:
+    tracer.write_jsonl(args.trace_file)
+    print(f"✓ Saved pipeline spans to {args.trace_file}")
@@ -0,0 +1,265 @@
+# tracing.py
+"""
+Lightweight span tracing for the experiment pipeline.
+
+A span is one timed stage (the LLM planning call, one training command, log
+aggregation, plot generation, ...) with optional attributes: token counts
+("prompt_tokens", "completion_tokens"), the time it waited for a worker or
+an LLM slot ("queue_wait"), a cache flag, and so on. The Tracer keeps the
+most recent spans and per-name aggregates:
+
+- Cumulative Prometheus histograms of duration and queue wait
+- p50/p95/p99 over a sliding window of the latest spans of each name
+- Token and error counters
+
+prometheus() renders everything in the Prometheus text exposition format
+(the backend serves it on /metrics); summary()/format_summary() give the
+same numbers as a dict or a table for command-line scripts.
+
+Example:
+    tracer = Tracer()
+    with tracer.span("llm_plan") as span:
+        response = client.chat.completions.create(...)
+        span.set(**token_usage(response))
+    tracer.record("command", 12.3, queue_wait=0.4)
+    print(tracer.format_summary())
+"""
+import bisect
+import contextlib
+import json
+import math
+import threading
+import time
+from collections import deque
+
+# Histogram bucket upper bounds in seconds: LLM calls and training runs range
+# from milliseconds (cache hits) to many minutes
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+QUANTILES = (0.5, 0.95, 0.99)
+TOKEN_ATTRS = ("prompt_tokens", "completion_tokens")
+
+
+class Span:
+    """One timed stage; set() adds attributes while it is open."""
+
+    __slots__ = ("name", "attrs", "start", "duration", "error")
+
+    def __init__(self, name: str, attrs: dict):
+        self.name = name
+        self.attrs = attrs
+        self.start = time.time()
+        self.duration = None
+        self.error = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "start": self.start, "duration": self.duration, "error": self.error, **self.attrs}
+
+
+class _Series:
+    """Cumulative histogram plus a sliding window of samples for quantiles."""
+
+    def __init__(self, buckets, window: int):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.recent.append(value)
+
+    def quantiles(self) -> dict:
+        values = sorted(self.recent)
+        if not values:
+            return {q: None for q in QUANTILES}
+        # Nearest-rank quantiles
+        return {q: values[min(len(values) - 1, max(0, math.ceil(q * len(values)) - 1))] for q in QUANTILES}
+
+
+class Tracer:
+    """
+    Args:
+        window: Samples per span name used for the p50/p95/p99 quantiles
+        max_spans: Finished spans kept for spans()/write_jsonl()
+        buckets: Histogram bucket upper bounds in seconds
+    """
+
+    def __init__(self, window: int = 1024, max_spans: int = 10000, buckets=DEFAULT_BUCKETS):
+        self.window = window
+        self.buckets = tuple(sorted(buckets))
+        self._spans = deque(maxlen=max_spans)
+        self._durations = {}
+        self._queue_waits = {}
+        self._tokens = {}
+        self._errors = {}
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def span(self, name: str, **attrs):
+        """Time the with-block as a span; exceptions are recorded on it and re-raised."""
+        span = Span(name, attrs)
+        start = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = type(e).__name__
+            raise
+        finally:
+            span.duration = time.perf_counter() - start
+            self._finish(span)
+
+    def record(self, name: str, duration: float, error=None, **attrs) -> Span:
+        """Add a span measured elsewhere (e.g. a command timed by the runner)."""
+        span = Span(name, attrs)
+        span.start -= duration
+        span.duration = duration
+        span.error = error
+        self._finish(span)
+        return span
+
+    def _finish(self, span: Span):
+        with self._lock:
+            self._spans.append(span)
+            self._series(self._durations, span.name).observe(span.duration)
+            queue_wait = span.attrs.get("queue_wait")
+            if queue_wait is not None:
+                self._series(self._queue_waits, span.name).observe(queue_wait)
+            for attr in TOKEN_ATTRS:
+                if span.attrs.get(attr):
+                    key = (span.name, attr)
+                    self._tokens[key] = self._tokens.get(key, 0) + span.attrs[attr]
+            if span.error:
+                self._errors[span.name] = self._errors.get(span.name, 0) + 1
+
+    def _series(self, table: dict, name: str) -> _Series:
+        series = table.get(name)
+        if series is None:
+            series = table[name] = _Series(self.buckets, self.window)
+        return series
+
+    # ------------------------------------------------------------------
+    # Reporting
+    # ------------------------------------------------------------------
+
+    def spans(self) -> list:
+        """Recent finished spans as dicts, oldest first."""
+        with self._lock:
+            return [span.to_dict() for span in self._spans]
+
+    def write_jsonl(self, path: str):
+        with open(path, "w") as f:
+            for span in self.spans():
+                f.write(json.dumps(span, default=str) + "\n")
+
+    def summary(self) -> dict:
+        """Per span name: count, total/p50/p95/p99 seconds, queue wait quantiles, tokens and errors."""
+        with self._lock:
+            result = {}
+            for name, series in self._durations.items():
+                entry = {
+                    "count": series.count,
+                    "total_seconds": series.sum,
+                    **{f"p{round(q * 100)}": v for q, v in series.quantiles().items()},
+                    "errors": self._errors.get(name, 0),
+                }
+                waits = self._queue_waits.get(name)
+                if waits is not None:
+                    entry["queue_wait_total_seconds"] = waits.sum
+                    entry.update({f"queue_wait_p{round(q * 100)}": v for q, v in waits.quantiles().items()})
+                for attr in TOKEN_ATTRS:
+                    if (name, attr) in self._tokens:
+                        entry[attr] = self._tokens[(name, attr)]
+                result[name] = entry
+            return result
+
+    def format_summary(self) -> str:
+        """Table of the spans by total time, for printing at the end of a script."""
+        summary = self.summary()
+        if not summary:
+            return "Trace: no spans recorded"
+        lines = [f"{'span':<24} {'count':>5} {'total':>9} {'p50':>8} {'p95':>8} {'p99':>8} {'queue p50':>10} {'tokens':>8}"]
+        for name, entry in sorted(summary.items(), key=lambda item: -item[1]["total_seconds"]):
+            wait = entry.get("queue_wait_p50")
+            tokens = sum(entry.get(attr, 0) for attr in TOKEN_ATTRS)
+            lines.append(
+                f"{name:<24} {entry['count']:>5} {entry['total_seconds']:>8.2f}s {entry['p50']:>7.2f}s "
+                f"{entry['p95']:>7.2f}s {entry['p99']:>7.2f}s "
+                f"{'-' if wait is None else f'{wait:.2f}s':>10} {tokens or '-':>8}"
+            )
+        return "\n".join(lines)
+
+    def prometheus(self, prefix: str = "trex") -> str:
+        """All aggregates in the Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            self._histogram(lines, f"{prefix}_span_duration_seconds", "Duration of pipeline spans", self._durations)
+            self._quantile_summary(lines, f"{prefix}_span_duration_recent_seconds",
+                                   f"Span duration quantiles over the last {self.window} spans of each name",
+                                   self._durations)
+            self._histogram(lines, f"{prefix}_span_queue_wait_seconds",
+                            "Time spans waited for a worker or LLM slot", self._queue_waits)
+            self._quantile_summary(lines, f"{prefix}_span_queue_wait_recent_seconds",
+                                   f"Queue wait quantiles over the last {self.window} spans of each name",
+                                   self._queue_waits)
+            lines.append(f"# HELP {prefix}_llm_tokens_total LLM tokens used by spans")
+            lines.append(f"# TYPE {prefix}_llm_tokens_total counter")
+            for (name, attr), value in sorted(self._tokens.items()):
+                kind = attr.split("_")[0]
+                lines.append(f'{prefix}_llm_tokens_total{{span="{_label(name)}",type="{kind}"}} {value}')
+            lines.append(f"# HELP {prefix}_span_errors_total Spans that ended with an exception or failure")
+            lines.append(f"# TYPE {prefix}_span_errors_total counter")
+            for name, value in sorted(self._errors.items()):
+                lines.append(f'{prefix}_span_errors_total{{span="{_label(name)}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def _histogram(self, lines: list, metric: str, help_text: str, table: dict):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} histogram")
+        for name, series in sorted(table.items()):
+            label = _label(name)
+            cumulative = 0
+            for bound, count in zip((*series.buckets, math.inf), series.counts):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else _number(bound)
+                lines.append(f'{metric}_bucket{{span="{label}",le="{le}"}} {cumulative}')
+            lines.append(f'{metric}_sum{{span="{label}"}} {_number(series.sum)}')
+            lines.append(f'{metric}_count{{span="{label}"}} {series.count}')
+
+    def _quantile_summary(self, lines: list, metric: str, help_text: str, table: dict):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} summary")
+        for name, series in sorted(table.items()):
+            label = _label(name)
+            for q, value in series.quantiles().items():
+                lines.append(f'{metric}{{span="{label}",quantile="{q}"}} {_number(value)}')
+            lines.append(f'{metric}_sum{{span="{label}"}} {_number(sum(series.recent))}')
+            lines.append(f'{metric}_count{{span="{label}"}} {len(series.recent)}')
+
+
+def _label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value) -> str:
+    return "NaN" if value is None else repr(float(value))
+
+
+def maybe_span(tracer, name: str, **attrs):
+    """tracer.span(name) when a tracer is given, else an unrecorded Span (so callers can always set())."""
+    if tracer is not None:
+        return tracer.span(name, **attrs)
+    return contextlib.nullcontext(Span(name, attrs))
+
+
+def token_usage(response) -> dict:
+    """prompt_tokens/completion_tokens of an OpenAI chat completion (empty if it has no usage)."""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return {}
+    return {attr: getattr(usage, attr, 0) or 0 for attr in TOKEN_ATTRS}